@@ -0,0 +1,128 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""benchmark the requests, transferred bytes and wall time per command
+
+Every command is executed as a separate jiracli process (like a user
+would do) against a local fake JIRA server with a configurable latency
+and number of issues. Every command runs twice: "cold" with an empty
+cache directory and "warm" with the caches of the first run. The numbers
+can be used as baseline to compare performance changes."""
+
+from __future__ import print_function
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from jiracli.tests.fakejira import FakeJira
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CMD = [sys.executable, '-c', 'import jiracli; jiracli.main()']
+
+
+def commands_get(issues, tmpdir):
+    """get (name, arguments) for the benchmarked commands"""
+    keys = ['TEST-%s' % n for n in range(1, min(issues, 20) + 1)]
+    issues_file = os.path.join(tmpdir, 'issues.txt')
+    with open(issues_file, 'w') as f:
+        for n in range(50):
+            f.write("story %s\n * task %s\n" % (n, n))
+    return [
+        ('issue', ['--issue'] + keys),
+        ('issue-search', ['--issue-search', 'project = TEST']),
+        ('issue-search-oneline', ['--issue-search', 'project = TEST',
+                                  '--issue-oneline']),
+        ('sprint', ['--sprint', 'TEST']),
+        ('export', ['--export', 'project = TEST',
+                    os.path.join(tmpdir, 'export.jsonl')]),
+        ('issues-create', ['--issues-create', 'TEST', 'Story', 'Sub-task',
+                           issues_file]),
+        ('trans-close', ['--issue-trans-close'] + keys),
+        ('label-add', ['--issue-label-add', ",".join(keys), 'bench']),
+    ]
+
+
+def config_write(home, server):
+    """write the jiracli configuration (with the default options)"""
+    conf = server.conf()
+    for option in conf.options('defaults'):
+        if option not in ('user', 'password', 'url'):
+            conf.remove_option('defaults', option)
+    with open(os.path.join(home, '.jiracli.ini'), 'w') as f:
+        conf.write(f)
+
+
+def command_run(server, env, args):
+    """run jiracli with args and get (exit code, requests, bytes, seconds)"""
+    server.stats_reset()
+    start = time.time()
+    with open(os.devnull, 'w') as devnull:
+        code = subprocess.call(CMD + args, env=env, stdout=devnull,
+                               stderr=devnull, stdin=devnull)
+    duration = time.time() - start
+    return code, server.requests, server.bytes_sent, duration
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--issues', type=int, default=500,
+                        help='number of issues (default: %(default)s)')
+    parser.add_argument('--latency', type=float, default=0.02,
+                        help='latency per request in seconds '
+                        '(default: %(default)s)')
+    parser.add_argument('--command', nargs='+', metavar='name',
+                        help='only run the given commands')
+    args = parser.parse_args()
+
+    server = FakeJira(issues=args.issues, latency=args.latency).start()
+    server.sprint = set('TEST-%s' % n for n in range(1, 11))
+    tmpdir = tempfile.mkdtemp(prefix='jiracli-bench_')
+    try:
+        env = dict(os.environ)
+        env.update({
+            'HOME': tmpdir,
+            'XDG_CACHE_HOME': os.path.join(tmpdir, 'cache'),
+            'XDG_RUNTIME_DIR': tmpdir,
+            'PYTHONPATH': ROOT,
+        })
+        config_write(tmpdir, server)
+        print("%s%s%s%s%s" % ("command".ljust(24), "run".ljust(6),
+                              "requests".ljust(10), "KiB".ljust(10),
+                              "seconds"))
+        for name, command in commands_get(args.issues, tmpdir):
+            if args.command and name not in args.command:
+                continue
+            shutil.rmtree(env['XDG_CACHE_HOME'], ignore_errors=True)
+            for run in ('cold', 'warm'):
+                code, requests, sent, duration = command_run(
+                    server, env, command)
+                print("%s%s%s%s%.2f%s" % (
+                    name.ljust(24), run.ljust(6), str(requests).ljust(10),
+                    ("%.1f" % (sent / 1024.0)).ljust(10), duration,
+                    "" if code == 0 else "  (exit code %s)" % code))
+    finally:
+        shutil.rmtree(tmpdir)
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""benchmark the export throughput for different numbers of workers
+
+The export runs against a local fake JIRA server which simulates the
+network latency for every request."""
+
+from __future__ import print_function
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import jiracli
+from jiracli.tests.fakejira import FakeJira
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--issues', type=int, default=5000,
+                        help='number of issues (default: %(default)s)')
+    parser.add_argument('--page-size', type=int, default=50,
+                        help='issues per page (default: %(default)s)')
+    parser.add_argument('--latency', type=float, default=0.05,
+                        help='latency per request in seconds '
+                        '(default: %(default)s)')
+    parser.add_argument('--jobs', type=int, nargs='+',
+                        default=[1, 2, 4, 8, 16],
+                        help='worker counts to benchmark '
+                        '(default: %(default)s)')
+    args = parser.parse_args()
+
+    server = FakeJira(issues=args.issues, latency=args.latency).start()
+    tmpdir = tempfile.mkdtemp(prefix='jiracli-bench_')
+    try:
+        print("%s%s%s%s" % ("jobs".ljust(8), "issues".ljust(10),
+                            "seconds".ljust(10), "issues/s"))
+        for jobs in args.jobs:
+            jira_obj = jiracli.jira_obj_get(server.conf(), jobs=jobs)
+            path = os.path.join(tmpdir, 'export-%s.jsonl' % jobs)
+            start = time.time()
+            count = jiracli.issue_export(jira_obj, 'project = TEST', path,
+                                         jobs=jobs,
+                                         page_size=args.page_size)
+            duration = time.time() - start
+            print("%s%s%s%.1f" % (str(jobs).ljust(8), str(count).ljust(10),
+                                  ("%.2f" % duration).ljust(10),
+                                  count / duration))
+    finally:
+        shutil.rmtree(tmpdir)
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""benchmark the rendering of issues
+
+Renders synthetic issues (generated like the issues of the fake JIRA
+server, with some comments and different timestamps) with
+issue_list_print() to /dev/null. No server is involved, so only the CPU
+time needed for the output is measured."""
+
+from __future__ import print_function
+
+import argparse
+import os
+import sys
+import time
+
+import jiracli
+from jiracli.tests.fakejira import comment_raw, issue_raw
+
+
+# name, show_desc, show_comments, oneline
+MODES = (
+    ('oneline', False, False, True),
+    ('default', False, False, False),
+    ('desc+comments', True, True, False),
+)
+
+
+def issues_get(count, comments):
+    """get count synthetic issues with the given number of comments"""
+    issues = []
+    for number in range(1, count + 1):
+        raw = issue_raw('TEST', number)
+        # a timestamp per hour so the date formatting is not only cached
+        date = '2017-%02d-%02dT%02d:13:24.000+0100' % (
+            number % 12 + 1, number % 28 + 1, number % 24)
+        raw['fields']['updated'] = date
+        raw['fields']['comment']['comments'] = [
+            comment_raw(n, 'comment %s of TEST-%s' % (n, number), date)
+            for n in range(comments)]
+        raw['fields']['fixVersions'] = [{'name': '1.0'}]
+        raw['fields']['issuelinks'] = [{'outwardIssue': {'key': 'TEST-1'}}]
+        issues.append(jiracli.issue_from_raw(raw))
+    return issues
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--issues', type=int, default=10000,
+                        help='number of issues (default: %(default)s)')
+    parser.add_argument('--comments', type=int, default=5,
+                        help='comments per issue (default: %(default)s)')
+    parser.add_argument('--runs', type=int, default=3,
+                        help='number of runs, the fastest one is shown '
+                        '(default: %(default)s)')
+    parser.add_argument('--no-color', action='store_true',
+                        help='render without colors')
+    args = parser.parse_args()
+
+    issues = issues_get(args.issues, args.comments)
+    # colors are only used for a tty
+    if not args.no_color:
+        os.environ['FORCE_COLOR'] = '1'
+    print("%s%s%s%s" % ("mode".ljust(16), "issues".ljust(10),
+                        "seconds".ljust(10), "issues/s"))
+    stdout = sys.stdout
+    for name, show_desc, show_comments, oneline in MODES:
+        durations = []
+        for _ in range(args.runs):
+            with open(os.devnull, 'w') as devnull:
+                sys.stdout = devnull
+                try:
+                    start = time.time()
+                    jiracli.issue_list_print(
+                        None, issues, show_desc, show_comments, False,
+                        oneline, color=not args.no_color)
+                    durations.append(time.time() - start)
+                finally:
+                    sys.stdout = stdout
+        duration = min(durations)
+        print("%s%s%s%.0f" % (name.ljust(16), str(len(issues)).ljust(10),
+                              ("%.2f" % duration).ljust(10),
+                              len(issues) / duration))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""benchmark the startup time of jiracli
+
+Measures the wall clock time of "jiracli --help" (compared to a bare
+python interpreter) and shows the slowest imports. With --max-ms the
+script exits with 1 if the startup overhead is above the given limit,
+so it can be used in CI to catch regressions."""
+
+from __future__ import print_function
+
+import argparse
+import subprocess
+import sys
+import time
+
+
+HELP_CMD = [sys.executable, '-c', 'import jiracli; jiracli.main()', '--help']
+BARE_CMD = [sys.executable, '-c', 'pass']
+
+
+def wall_time_ms(cmd, runs):
+    """get the median wall clock time in milliseconds for cmd"""
+    times = []
+    for _ in range(runs):
+        start = time.time()
+        subprocess.check_call(cmd, stdout=subprocess.PIPE)
+        times.append((time.time() - start) * 1000)
+    return sorted(times)[len(times) // 2]
+
+
+def imports_slowest(count):
+    """get the slowest (cumulative) imports for jiracli"""
+    out = subprocess.check_output(
+        [sys.executable, '-X', 'importtime', '-c', 'import jiracli'],
+        stderr=subprocess.STDOUT).decode('utf-8')
+    imports = []
+    for line in out.splitlines()[1:]:
+        _, _, cumulative, name = [f.strip() for f in
+                                  line.replace(':', '|', 1).split('|')]
+        imports.append((int(cumulative), name))
+    return sorted(imports, reverse=True)[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=20,
+                        help='number of runs (default: %(default)s)')
+    parser.add_argument('--max-ms', type=float,
+                        help='fail if the startup overhead (compared to a '
+                        'bare python) is above the given milliseconds')
+    args = parser.parse_args()
+
+    bare = wall_time_ms(BARE_CMD, args.runs)
+    jiracli_help = wall_time_ms(HELP_CMD, args.runs)
+    overhead = jiracli_help - bare
+    print("python -c pass       : %.1f ms" % bare)
+    print("jiracli --help       : %.1f ms" % jiracli_help)
+    print("jiracli overhead     : %.1f ms" % overhead)
+    print("\nslowest imports (cumulative):")
+    for cumulative, name in imports_slowest(10):
+        print("%s %.1f ms" % (name.ljust(30), cumulative / 1000.0))
+
+    if args.max_ms is not None and overhead > args.max_ms:
+        print("\nstartup overhead %.1f ms is above %.1f ms" % (
+            overhead, args.max_ms))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -18,28 +18,65 @@
 
 from __future__ import print_function
 
-from collections import OrderedDict
+from collections import OrderedDict, deque
 import argparse
+import atexit
 import datetime
+import functools
+import itertools
+import json
 import logging
 import os
-import subprocess
+import re
+import shutil
 import sys
 import tempfile
+import threading
+import time
 
-from termcolor import colored as colorfunc
-from jira import JIRA
-import requests
-from requests.packages.urllib3.exceptions import InsecureRequestWarning
-import tabulate
-
-from .config import config_get
+from .cache import Cache, cache_dir_get
+from .config import config_get, session_cookies_load, session_cookies_save
+from .output import FORMATS, BufferedWriter, RecordWriter
+from .trace import HttpTrace, profile_run
 
 
 # log object
 LOG = logging.getLogger('jiracli')
 # path to the user configuration file
 user_config_path = os.path.expanduser('~/.jiracli.ini')
+# path to the session cookies (if session_cache is enabled)
+user_session_path = os.path.expanduser('~/.jiracli.session')
+# names of the transitions (or of the target status) used by the
+# --issue-trans-* commands. the first available transition is used
+TRANSITION_NAMES = {
+    'open': ('reopen issue', 'reopen', 'open', 'reopened'),
+    'progress': ('start progress', 'in progress'),
+    'resolved': ('resolve issue', 'resolved'),
+    'closed': ('close issue', 'closed'),
+}
+# fields which are always requested: issue_header() and the transitions
+# cache key (see issue_transitions_get()) need them
+ISSUE_REQUIRED_FIELDS = ('project', 'issuetype', 'status', 'summary',
+                         'priority')
+# fields requested by default: everything used by issue_format()
+ISSUE_FIELDS = ISSUE_REQUIRED_FIELDS + (
+    'parent', 'description', 'created', 'reporter', 'assignee', 'updated',
+    'versions', 'fixVersions', 'components', 'labels', 'attachment',
+    'issuelinks', 'comment')
+# columns for --format csv/tsv (see issue_export_record())
+ISSUE_RECORD_COLUMNS = (
+    'key', 'issuetype', 'status', 'priority', 'summary', 'description',
+    'parent', 'created', 'reporter', 'assignee', 'updated', 'versions',
+    'components', 'labels', 'attachment', 'issuelinks', 'comments')
+FILTER_RECORD_COLUMNS = ('id', 'name', 'owner', 'jql', 'url', 'description')
+# how the results of several searches are printed (see --search-mode)
+SEARCH_MODES = ('merge', 'tag', 'sections')
+# fields for --group-by
+GROUP_BY_FIELDS = ('status', 'assignee', 'component', 'priority')
+# --group-by fields with a single value per issue
+GROUP_BY_SINGLE_FIELDS = ('status', 'assignee', 'priority')
+# maximum number of values (a search per value) for --group-by
+GROUP_BY_MAX_VALUES = 100
 
 # Force utf8 encoding for output if not defined (useful for piping)
 if sys.stdout.encoding is None:
@@ -48,11 +85,29 @@ if sys.stdout.encoding is None:
     sys.stdout = writer(sys.stdout)
 
 
-def setup_logging(logger, debug):
+def color_codes(color=None, attrs=None):
+    """get the escape sequence which starts a text with the color and
+    attributes (see termcolor.colored())"""
+    # termcolor is only imported when output is colorized
+    from termcolor import ATTRIBUTES, COLORS
+    codes = [COLORS[color]] if color else []
+    codes.extend(ATTRIBUTES[attr] for attr in attrs or [])
+    return "".join('\033[%dm' % code for code in codes)
+
+
+def stdout_isatty():
+    """check if the output is written to a terminal"""
+    return hasattr(sys.stdout, 'isatty') and sys.stdout.isatty()
+
+
+def setup_logging(logger, debug, trace_http=False):
     sh = logging.StreamHandler()
     if debug:
         logger.setLevel(logging.DEBUG)
         sh.setLevel(logging.DEBUG)
+    # every request is logged (see HttpTrace)
+    if trace_http:
+        logging.getLogger('jiracli.http').setLevel(logging.INFO)
     formatter = logging.Formatter('%(levelname)s - %(message)s')
     sh.setFormatter(formatter)
     logger.addHandler(sh)
@@ -73,10 +128,15 @@ def editor_get_text(text_template):
 
 def sprint(jira_obj, project):
     issues = jira_obj.search_issues(
-        'project = "%s" AND sprint IN openSprints()' % project)
-    height, width = [
-        int(v) for v in
-        subprocess.check_output(["stty", "size"]).strip().split()]
+        'project = "%s" AND sprint IN openSprints()' % project,
+        fields='status,assignee,summary')
+    sprint_print(issues)
+
+
+def sprint_print(issues):
+    """print a table for the issues of a sprint"""
+    # falls back to 80 columns if the output is not a terminal
+    width = shutil.get_terminal_size().columns
 
     content = []
     sizes = [0, 0, 0]
@@ -93,29 +153,197 @@ def sprint(jira_obj, project):
     for line in content:
         line[-1] = line[-1][:summary_width]
 
+    import tabulate
     print(tabulate.tabulate(content,
                             headers=['issue', 'status',
                                      'assignee', 'summary']))
 
 
-def jira_obj_get(conf):
+def mirror_path_get(conf):
+    """get the path of the local issue mirror (see --sync)"""
+    return os.path.join(cache_dir_get(conf.get('defaults', 'url'),
+                                      conf.get('defaults', 'user')),
+                        'mirror.sqlite')
+
+
+def issue_from_raw(raw):
+    """get an issue resource for the raw json (ie. from the mirror)"""
+    from jira.resources import Issue
+    return Issue({}, None, raw=raw)
+
+
+class LazyJIRA(object):
+    """a proxy for a JIRA object which is created on first use
+
+    Commands which do not talk to the server (ie. if everything is
+    available in the cache) don't pay for importing jira and creating
+    the client."""
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._jira_obj = None
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        with self._lock:
+            if self._jira_obj is None:
+                self._jira_obj = self._factory()
+        return getattr(self._jira_obj, name)
+
+
+def jira_obj_get(conf, jobs=1, cache=None, session_path=None,
+                 http_cache_path=None, http_cache_size=0, trace=None,
+                 max_retries=5, limiter=None):
+    """get a JIRA object for the server from the configuration
+
+    If a cache is given, the server info (used by the jira module to
+    decide which API to use) is cached instead of requesting it every
+    time the object is created.
+    If a session_path is given, the session cookies are loaded from and
+    (at exit) stored to that file. Basic auth is only used if there is
+    no valid session cookie.
+    If a http_cache_path is given, GET responses are stored (up to
+    http_cache_size bytes) in that directory and revalidated with
+    conditional requests.
+    If a trace (a HttpTrace) is given, it gets every response.
+    Throttled and failed idempotent requests are retried up to max_retries
+    times and the parallel requests of the jobs are adapted to the rate
+    limit of the server (see ratelimit). limiter is the AIMDLimiter for
+    the requests (default: a new one with jobs as maximum)."""
+    from jira import JIRA
+    import requests
+
+    from .ratelimit import AIMDLimiter, RetryAdapter
+
     verify = conf.getboolean('defaults', 'verify')
 
     options = {
         'server': conf.get('defaults', 'url'),
         'verify': verify,
     }
-    return JIRA(options, basic_auth=(conf.get('defaults', 'user'),
-                                     conf.get('defaults', 'password')))
+    jira_obj = JIRA(options=options,
+                    basic_auth=(conf.get('defaults', 'user'),
+                                conf.get('defaults', 'password')),
+                    get_server_info=cache is None,
+                    # retried by the RetryAdapter
+                    max_retries=0)
+    if trace is not None:
+        trace.install(jira_obj._session)
+    if cache is not None:
+        server_info = cache.get('server_info')
+        if server_info is None:
+            server_info = jira_obj.server_info()
+            cache.set('server_info', server_info)
+        jira_obj._version = tuple(server_info['versionNumbers'])
+        jira_obj.deploymentType = server_info.get('deploymentType')
+    if session_path is not None:
+        from .auth import CookieFallbackAuth, cookies_from_jar, cookies_to_jar
+        session = jira_obj._session
+        cookies_to_jar(session.cookies, session_cookies_load(session_path))
+        session.auth = CookieFallbackAuth(conf.get('defaults', 'user'),
+                                          conf.get('defaults', 'password'))
+        atexit.register(lambda: session_cookies_save(
+            session_path, cookies_from_jar(session.cookies)))
+    # keep a connection per worker thread in the pool so parallel
+    # requests do not need to open new connections
+    pool_maxsize = max(jobs, requests.adapters.DEFAULT_POOLSIZE)
+    if http_cache_path is not None and http_cache_size > 0:
+        from .httpcache import CachingAdapter
+        adapter = CachingAdapter(http_cache_path, http_cache_size,
+                                 pool_maxsize=pool_maxsize)
+        atexit.register(adapter.save)
+        atexit.register(lambda: LOG.debug("%s", adapter.stats()))
+    else:
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=pool_maxsize)
+    if limiter is None:
+        limiter = AIMDLimiter(jobs)
+    adapter = RetryAdapter(adapter, limiter, max_retries=max_retries)
+    for prefix in ('https://', 'http://'):
+        jira_obj._session.mount(prefix, adapter)
+    return jira_obj
+
+
+def async_client_get(conf, concurrency):
+    """get an AsyncJira (see aioclient) for the server from the
+    configuration. Raises ImportError if aiohttp is not available"""
+    from .aioclient import AsyncJira
+    return AsyncJira(conf.get('defaults', 'url'),
+                     conf.get('defaults', 'user'),
+                     conf.get('defaults', 'password'),
+                     verify=conf.getboolean('defaults', 'verify'),
+                     concurrency=concurrency,
+                     max_retries=conf.getint('defaults', 'max_retries'))
+
+
+def parallel_map(func, items, jobs=1):
+    """call func for every item with the given number of parallel jobs
+
+    Yields (item, result, error) tuples in the order of the given items
+    as soon as they are available. An exception raised for a single item
+    does not abort the other calls. The items (ie. a generator) are
+    consumed while the results are yielded: at most 2 * jobs calls are
+    pending at once."""
+    from concurrent.futures import ThreadPoolExecutor
+
+    def call(item):
+        try:
+            return item, func(item), None
+        except Exception as e:
+            return item, None, e
+
+    with ThreadPoolExecutor(jobs) as pool:
+        pending = deque()
+        for item in items:
+            pending.append(pool.submit(call, item))
+            if len(pending) >= 2 * jobs:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def bulk_execute(func, issues, jobs=1, action='done', client=None):
+    """call func for every issue key in parallel and report the result
+    for every issue. If an AsyncJira client is given, func is a coroutine
+    function which is called in the event loop of the client. Returns True
+    if func succeeded for all issues"""
+    if client is not None:
+        results = client.map(func, issues)
+    else:
+        results = parallel_map(func, issues, jobs=jobs)
+    ok = True
+    for issue, result, error in results:
+        if error is None:
+            print("%s : %s" % (issue.ljust(20), action))
+        else:
+            LOG.error("%s : failed: %s", issue, error_text(error))
+            ok = False
+    return ok
 
 
+def error_text(error):
+    """get a short message for an exception"""
+    # JIRAError contains the whole response in its str() representation
+    return getattr(error, 'text', None) or str(error)
+
+
+@functools.lru_cache(maxsize=4096)
 def dtstr2dt(dtstr):
     """nicer datetime string
     jira delivers something like '2013-11-07T16:13:24.000+0100'"""
     # TODO: maybe %c is not the best formatter.
     # Output depends on current locale
-    return datetime.datetime.strptime(dtstr[:-9],
-                                      "%Y-%m-%dT%H:%M:%S").strftime("%c")
+    # parsed by hand (strptime() is slow) and cached because the same
+    # timestamps are formatted again and again (ie. created and updated)
+    return datetime.datetime(
+        int(dtstr[0:4]), int(dtstr[5:7]), int(dtstr[8:10]),
+        int(dtstr[11:13]), int(dtstr[14:16]),
+        int(dtstr[17:19])).strftime("%c")
+
+
+# colors returned by issue_status_color()
+STATUS_COLORS = ('green', 'red', 'yellow', 'blue')
+# escape sequence which ends a colored text
+COLOR_RESET = '\033[0m'
 
 
 def issue_status_color(status):
@@ -130,81 +358,450 @@ def issue_status_color(status):
         return 'blue'
 
 
-def issue_header(issue):
-    """get a single line string for an issue"""
-    if getattr(issue.fields, "priority", None) is not None:
-        priority = "%s" % issue.fields.priority.name
+def issue_transitions_get(jira_obj, issue, cache=None):
+    """get the available transitions for an issue
+
+    The transitions are cached per workflow state (project, issue type
+    and status) so only the first issue in every state needs a request"""
+    key = "%s|%s|%s" % (issue.fields.project.key,
+                        issue.fields.issuetype.name,
+                        issue.fields.status.name)
+    # transitions are already part of the issue if it was requested
+    # with expand=transitions (ie. via issue_search_result_print())
+    transitions = issue.raw.get('transitions')
+    if transitions is None and cache is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+    if transitions is None:
+        transitions = jira_obj.transitions(issue)
+    transitions = [{'id': t['id'], 'name': t['name'],
+                    'to': t.get('to', {}).get('name', '')}
+                   for t in transitions]
+    if cache is not None:
+        cache.set(key, transitions)
+    return transitions
+
+
+def issue_transition_find(transitions, names):
+    """get the id of the first transition which matches one of the given
+    (lowercase) names. The transition name or the name of the target
+    status must match. Returns None if no transition matches"""
+    for name in names:
+        for t in transitions:
+            if name in (t['name'].lower(), t['to'].lower()):
+                return t['id']
+    return None
+
+
+def issues_transition(jira_obj, issues, action, cache=None, jobs=1,
+                      assignee=None, client=None, **fields):
+    """move the given issues with the transition for action (see
+    TRANSITION_NAMES). If an AsyncJira client is given, it moves the
+    issues. Returns True if all issues were moved"""
+    # get the workflow state of all issues with a single search
+    states = dict(
+        (i.key, i) for i in issue_search_iter(
+            jira_obj, 'key in (%s)' % ", ".join(issues),
+            page_size=max(len(issues), 1), validate_query=False,
+            fields='project,issuetype,status'))
+    # only a single job fetches the transitions for a workflow state,
+    # the others wait and use the cached transitions
+    lock = threading.Lock()
+
+    def transition_id_get(key):
+        issue = states.get(key.upper())
+        if issue is None:
+            raise ValueError("issue does not exist")
+        with lock:
+            transitions = issue_transitions_get(jira_obj, issue, cache)
+        transition_id = issue_transition_find(transitions,
+                                              TRANSITION_NAMES[action])
+        if transition_id is None:
+            raise ValueError("no '%s' transition available in status "
+                             "'%s'" % (action, issue.fields.status.name))
+        return transition_id
+
+    def transition(key):
+        transition_id = transition_id_get(key)
+        if assignee is not None:
+            jira_obj.assign_issue(key, assignee)
+        jira_obj.transition_issue(key, transition_id, **fields)
+
+    async def transition_async(key):
+        # blocks the event loop only for the first issue of every
+        # workflow state, the transitions of the others are cached
+        transition_id = transition_id_get(key)
+        if assignee is not None:
+            await client.assign_issue(key, assignee)
+        await client.transition_issue(key, transition_id, **fields)
+
+    return bulk_execute(transition if client is None else transition_async,
+                        issues, jobs=jobs, action='moved to %s' % action,
+                        client=client)
+
+
+def issues_field_edit(jira_obj, issues, field, operation, values, jobs=1):
+    """add or remove (operation) the values to/from a list field (labels,
+    components or fixVersions) of the issues
+
+    The server applies the change, so every issue needs a single request
+    and concurrent edits of the same issue do not overwrite each other.
+    The server matches labels exactly, so labels to remove are compared
+    case insensitive with the labels of the issue (an additional request
+    per issue).
+    Returns True if all issues were updated"""
+    def data_get(values):
+        if field == 'labels':
+            operations = [{operation: v} for v in values]
+        else:
+            operations = [{operation: {'name': v}} for v in values]
+        return json.dumps({'update': {field: operations}})
+
+    data = data_get(values)
+    remove_labels = field == 'labels' and operation == 'remove'
+    names = set(v.lower() for v in values)
+
+    def edit(issue):
+        issue_data = data
+        if remove_labels:
+            labels = jira_obj._get_json('issue/%s' % issue, params={
+                'fields': 'labels'})['fields']['labels']
+            labels = [label for label in labels if label.lower() in names]
+            if not labels:
+                return
+            issue_data = data_get(labels)
+        jira_obj._session.put(jira_obj._get_url('issue/%s' % issue),
+                              data=issue_data)
+
+    action = '%s %s' % ('added' if operation == 'add' else 'removed',
+                        ", ".join(values))
+    return bulk_execute(edit, issues, jobs=jobs, action=action)
+
+
+def attachment_filenames(attachments):
+    """get the filenames (which must not be paths) of the attachments of
+    an issue. Attachments with the same name get their id as prefix"""
+    names = [os.path.basename(a['filename']) for a in attachments]
+    return [name if names.count(name) == 1 else
+            "%s_%s" % (a['id'], name) for a, name in zip(attachments, names)]
+
+
+def attachment_download(jira_obj, attachment, path, chunk_size=65536):
+    """download an attachment (the raw json) to path in chunks
+
+    The data is written to path + '.part' which is renamed when the
+    download is complete. An existing .part file (ie. from an interrupted
+    download) is continued with a Range request. Returns the number of
+    transferred bytes or None if path already exists with the size of the
+    attachment."""
+    if os.path.exists(path) and \
+            os.path.getsize(path) == attachment['size']:
+        return None
+    part = path + '.part'
+    offset = os.path.getsize(part) if os.path.exists(part) else 0
+    if offset >= attachment['size']:
+        offset = 0
+    headers = {'Range': 'bytes=%d-' % offset} if offset else {}
+    response = jira_obj._session.get(attachment['content'], stream=True,
+                                     headers=headers)
+    try:
+        response.raise_for_status()
+        # the server may ignore the range and send the whole file
+        mode = 'ab' if response.status_code == 206 else 'wb'
+        transferred = 0
+        with open(part, mode) as f:
+            for chunk in response.iter_content(chunk_size):
+                f.write(chunk)
+                transferred += len(chunk)
+    finally:
+        response.close()
+    os.rename(part, path)
+    return transferred
+
+
+def issues_attachments_get(jira_obj, issues, dest, jobs=1):
+    """download the attachments of the issues to dest/<issue key>/ with
+    the given number of parallel downloads and report the throughput.
+    Returns True if all attachments are available"""
+    attachments = []
+    found = set()
+    for issue in issue_search_iter(
+            jira_obj, 'key in (%s)' % ", ".join(issues),
+            page_size=max(len(issues), 1), validate_query=False,
+            fields='attachment'):
+        found.add(issue.key)
+        issue_attachments = issue.raw['fields'].get('attachment') or []
+        attachments.extend(
+            (issue.key, a, filename) for a, filename in zip(
+                issue_attachments, attachment_filenames(issue_attachments)))
+    ok = True
+    for key in issues:
+        if key.upper() not in found:
+            LOG.error("%s : failed: issue does not exist", key)
+            ok = False
+
+    def download(item):
+        key, attachment, filename = item
+        directory = os.path.join(dest, key)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, filename)
+        start = time.time()
+        return attachment_download(jira_obj, attachment, path), \
+            time.time() - start
+
+    start = time.time()
+    total = 0
+    for (key, _, filename), result, error in parallel_map(
+            download, attachments, jobs=jobs):
+        name = "%s/%s" % (key, filename)
+        if error is not None:
+            LOG.error("%s : failed: %s", name, error_text(error))
+            ok = False
+            continue
+        transferred, elapsed = result
+        if transferred is None:
+            print("%s : already downloaded" % name.ljust(40))
+            continue
+        total += transferred
+        print("%s : %s bytes, %.1f MiB/s" % (
+            name.ljust(40), transferred,
+            transferred / max(elapsed, 1e-6) / 1024 / 1024))
+    elapsed = time.time() - start
+    print("%s attachments, %s bytes in %.1f s (%.1f MiB/s)" % (
+        len(attachments), total, elapsed,
+        total / max(elapsed, 1e-6) / 1024 / 1024))
+    return ok
+
+
+def metadata_get(cache, key, func):
+    """get metadata (a list of raw json objects) from the cache or, if not
+    cached, from the server by calling func (which returns jira resources
+    or raw json objects)"""
+    data = cache.get(key)
+    if data is None:
+        data = [getattr(r, 'raw', r) for r in func()]
+        cache.set(key, data)
+    return data
+
+
+def metadata_names_check(metadata, names, kind):
+    """check that all names are available in the metadata (compared
+    case insensitive). Returns True if all names are valid"""
+    available = set(m['name'].lower() for m in metadata)
+    ok = True
+    for name in names:
+        if name.lower() not in available:
+            LOG.error("unknown %s '%s'. available are: %s", kind, name,
+                      ", ".join(sorted(m['name'] for m in metadata)))
+            ok = False
+    return ok
+
+
+def issue_fields_get(fields=None, comments=True):
+    """get the fields parameter for requests which get issues
+
+    fields is a comma separated list of field names (ie. from --fields)
+    which replaces the default fields (see ISSUE_FIELDS). The fields in
+    ISSUE_REQUIRED_FIELDS are always added. comments=False removes the
+    comment field (ie. if the comments are fetched with
+    issue_comments_get())"""
+    if not fields:
+        names = list(ISSUE_FIELDS)
     else:
-        priority = "n/a"
-
-    return "%s (%s)" % (colorfunc("%s, %s: %s" % (issue.key,
-                                                  issue.fields.issuetype.name,
-                                                  issue.fields.summary),
-                                  None, attrs=['bold', 'underline']),
-                        colorfunc("%s, %s" % (issue.fields.status.name,
-                                              priority),
-                                  issue_status_color(issue.fields.status.name),
-                                  attrs=['bold']))
+        names = [f.strip() for f in fields.split(',') if f.strip()]
+        names = list(ISSUE_REQUIRED_FIELDS) + [
+            n for n in names if n not in ISSUE_REQUIRED_FIELDS]
+    if not comments:
+        names = [n for n in names if n != 'comment']
+    return ",".join(names)
+
+
+def comment_created(comment):
+    """get the (timezone aware) datetime when a comment was created"""
+    return datetime.datetime.strptime(comment['created'],
+                                      "%Y-%m-%dT%H:%M:%S.%f%z")
+
+
+def issue_comments_get(jira_obj, key, last=None, since=None, page_size=50):
+    """get the number of comments of an issue and the last comments and/or
+    the comments created since the (timezone aware) datetime since
+
+    The comments are requested newest first from the paginated comment
+    endpoint, so only the needed comments are transferred. With last=0
+    only the number of comments is requested. Returns the number and the
+    comments (oldest first)."""
+    comments = []
+    start_at = 0
+    while True:
+        max_results = page_size
+        if last is not None:
+            max_results = min(page_size, last - len(comments))
+        data = jira_obj._get_json('issue/%s/comment' % key, params={
+            'startAt': start_at, 'maxResults': max_results,
+            'orderBy': '-created'})
+        for comment in data['comments']:
+            if since is not None and comment_created(comment) < since:
+                return data['total'], comments[::-1]
+            comments.append(comment)
+        start_at += len(data['comments'])
+        if not data['comments'] or start_at >= data['total'] or \
+                (last is not None and len(comments) >= last):
+            return data['total'], comments[::-1]
+
+
+def issues_comments_load(jira_obj, issues, last=None, since=None, jobs=1):
+    """get the comments (see issue_comments_get()) for the issues in
+    parallel and store them in the comment field of the issues (which
+    were requested without it)"""
+    def load(issue):
+        total, comments = issue_comments_get(jira_obj, issue.key, last=last,
+                                             since=since)
+        issue.raw['fields']['comment'] = {
+            'comments': comments, 'total': total, 'startAt': 0,
+            'maxResults': len(comments)}
+        return issue
+
+    for issue, result, error in parallel_map(load, issues, jobs=jobs):
+        if error is not None:
+            raise error
+        yield result
+
+
+def date_parse(value):
+    """get a timezone aware datetime for a local date ('YYYY-MM-DD' or
+    'YYYY-MM-DD HH:MM'). Raises ValueError for other strings"""
+    for fmt in ("%Y-%m-%d %H:%M", "%Y-%m-%d"):
+        try:
+            return datetime.datetime.strptime(value, fmt).astimezone()
+        except ValueError:
+            pass
+    raise ValueError("%s is not a date (YYYY-MM-DD [HH:MM])" % value)
+
+
+def comments_sliced(args):
+    """check if only some comments are requested (see --comments-last and
+    --comments-since). Otherwise the comments (or their number) are
+    requested with the issues"""
+    return args['comments_last'] is not None or \
+        args['comments_since'] is not None
+
+
+def issues_comments_sliced(jira_obj, args, issues):
+    """get the issues with the comments requested by --comments-last and
+    --comments-since (if given)"""
+    if not comments_sliced(args):
+        return issues
+    since = args['comments_since']
+    return issues_comments_load(
+        jira_obj, issues, last=args['comments_last'],
+        since=date_parse(since) if since else None, jobs=args['jobs'])
+
+
+def palette_get(enabled=True, tty=None):
+    """get the escape sequences which start the colored parts of the
+    output: 'header', 'comment', one for every status color (see
+    issue_status_color()) and 'reset'. The sequences are computed once
+    for all issues and are empty if enabled is False, if the output is
+    not a terminal (tty, default: stdout_isatty(), a daemon gets the
+    flag of the client) or if NO_COLOR or ANSI_COLORS_DISABLED are set"""
+    keys = ('header', 'comment', 'reset') + STATUS_COLORS
+    palette = dict.fromkeys(keys, '')
+    if tty is None:
+        tty = stdout_isatty()
+    if not enabled or not tty or os.environ.get('NO_COLOR') or \
+            os.environ.get('ANSI_COLORS_DISABLED'):
+        return palette
+
+    palette['header'] = color_codes(attrs=['bold', 'underline'])
+    palette['comment'] = color_codes(attrs=['reverse'])
+    for color in STATUS_COLORS:
+        palette[color] = color_codes(color, ['bold'])
+    palette['reset'] = COLOR_RESET
+    return palette
+
+
+def issue_header(issue, palette=None):
+    """get a single line string for an issue"""
+    if palette is None:
+        palette = palette_get()
+    # the raw json is used because it is a lot faster than the attribute
+    # access of the jira resources
+    raw = issue.raw['fields']
+    priority = (raw.get('priority') or {}).get('name') or "n/a"
+    status = raw['status']['name']
+    return "%s%s, %s: %s%s (%s%s, %s%s)" % (
+        palette['header'], issue.key, raw['issuetype']['name'],
+        raw['summary'], palette['reset'],
+        palette[issue_status_color(status)], status, priority,
+        palette['reset'])
 
 
 def issue_format(jira_obj, issue, show_desc=False, show_comments=False,
-                 show_trans=False):
+                 show_trans=False, transitions_cache=None, palette=None):
     """return a dict with fields which describe the issue"""
+    # only the comments are colored
+    if palette is None and show_comments:
+        palette = palette_get()
+    # fields may be missing if they were not requested (see --fields)
+    raw = issue.raw['fields']
     fields = OrderedDict()
-    if hasattr(issue.fields, "parent"):
-        fields['parent'] = "%s" % (issue.fields.parent.key)
-    if show_desc:
-        fields['description'] = "\n%s" % (issue.fields.description)
-    fields['created'] = dtstr2dt(issue.fields.created)
-    if hasattr(issue.fields, "reporter"):
-        fields['created'] += ", by %s" % (issue.fields.reporter.name)
-
-    if hasattr(issue.fields.assignee, 'name'):
-        fields['assignee'] = issue.fields.assignee.name
-    fields['updated'] = dtstr2dt(issue.fields.updated)
-    if hasattr(issue.fields, 'versions') and len(issue.fields.fixVersions) > 0:
-        fields['versions'] = ", ".join(map(lambda x: x.name,
-                                           issue.fields.fixVersions))
-    if hasattr(issue.fields, 'components') and \
-       len(issue.fields.components) > 0:
-        fields['components'] = ", ".join(map(lambda x: x.name,
-                                             issue.fields.components))
-    if hasattr(issue.fields, 'labels') and len(issue.fields.labels) > 0:
-        fields['labels'] = ", ".join(map(lambda x: x, issue.fields.labels))
-    if hasattr(issue.fields, 'attachment') and \
-       len(issue.fields.attachment) > 0:
-        fields['attachment'] = ", ".join(map(lambda x: x.filename,
-                                             issue.fields.attachment))
-    if hasattr(issue.fields, 'issuelinks') and \
-       len(issue.fields.issuelinks) > 0:
-        link_list = list()
+    if 'parent' in raw:
+        fields['parent'] = raw['parent']['key']
+    if show_desc and 'description' in raw:
+        fields['description'] = "\n%s" % (raw['description'] or '')
+    if 'created' in raw:
+        fields['created'] = dtstr2dt(raw['created'])
+        if raw.get('reporter'):
+            fields['created'] += ", by %s" % raw['reporter']['name']
+    assignee = raw.get('assignee')
+    if assignee and 'name' in assignee:
+        fields['assignee'] = assignee['name']
+    if 'updated' in raw:
+        fields['updated'] = dtstr2dt(raw['updated'])
+    if 'versions' in raw and raw.get('fixVersions'):
+        fields['versions'] = ", ".join(v['name'] for v in raw['fixVersions'])
+    if raw.get('components'):
+        fields['components'] = ", ".join(c['name'] for c in raw['components'])
+    if raw.get('labels'):
+        fields['labels'] = ", ".join(raw['labels'])
+    if raw.get('attachment'):
+        fields['attachment'] = ", ".join(a['filename']
+                                         for a in raw['attachment'])
+    if raw.get('issuelinks'):
         # inward issue: the issue to link from
         # outward issue: the issue to link to
-        for link in issue.fields.issuelinks:
-            if 'outwardIssue' in link.raw:
-                link_list.append(link.raw['outwardIssue'])
-            elif 'inwardIssue' in link.raw:
-                link_list.append(link.raw['inwardIssue'])
-        fields['issuelinks'] = ", ".join(map(lambda x: x['key'], link_list))
+        fields['issuelinks'] = ", ".join(
+            (link.get('outwardIssue') or link['inwardIssue'])['key']
+            for link in raw['issuelinks']
+            if 'outwardIssue' in link or 'inwardIssue' in link)
+    comments = raw['comment']['comments'] if raw.get('comment') else None
+    count = "0"
+    if comments is not None:
+        total = raw['comment'].get('total', len(comments))
+        count = "%s" % total
+        if show_comments and len(comments) < total:
+            count += " (%s shown)" % len(comments)
     if show_comments:
-        if hasattr(issue.fields, 'comment'):
-            fields['comments'] = "%s\n%s" % (
-                len(issue.fields.comment.comments),
-                "\n\n".join(map(lambda x: "%s\n%s" % (colorfunc("%s, %s" % (dtstr2dt(x.updated), x.updateAuthor.name), None, attrs=['reverse']), x.body), issue.fields.comment.comments)))  # noqa
+        if comments is not None:
+            fields['comments'] = "%s\n%s" % (count, "\n\n".join(
+                "%s%s, %s%s\n%s" % (palette['comment'],
+                                    dtstr2dt(c['updated']),
+                                    c['updateAuthor']['name'],
+                                    palette['reset'], c['body'])
+                for c in comments))
         else:
             fields['comments'] = "0"
-    else:
+    elif comments is not None and count != "0":
         # show only the number of comments
-        if hasattr(issue.fields, 'comment') and \
-           len(issue.fields.comment.comments) > 0:
-            fields['comments'] = "%s" % (len(issue.fields.comment.comments))
+        fields['comments'] = count
 
     if show_trans:
-        transitions = jira_obj.transitions(issue)
-        fields['trans'] = ", ".join(map(
-            lambda x: x['name'] + "(" + x['id'] + ")", transitions))
+        transitions = issue_transitions_get(jira_obj, issue,
+                                            transitions_cache)
+        fields['trans'] = ", ".join("%s(%s)" % (t['name'], t['id'])
+                                    for t in transitions)
 
-    # print(dir(issue.fields))
     # add empty strings if field not available
     for k, v in fields.items():
         if not v:
@@ -213,54 +810,506 @@ def issue_format(jira_obj, issue, show_desc=False, show_comments=False,
 
 
 def issue_list_print(jira_obj, issue_list, show_desc, show_comments,
-                     show_trans, oneline):
-    """print a list of issues"""
-    # disable color if oneline is used
-    if oneline:
-        global colorfunc
-        colorfunc = lambda *a, **k: a[0]
-
+                     show_trans, oneline, transitions_cache=None, fmt='text',
+                     color=True, tags=None, tty=None):
+    """print a list of issues
+
+    With a fmt other than 'text' (see --format) a record is written for
+    every issue (see issue_export_record()).
+    tags is a dict with a text per issue key (ie. the searches which
+    matched the issue) which is printed as 'queries'"""
+    if fmt != 'text':
+        columns = ISSUE_RECORD_COLUMNS
+        if tags is not None:
+            columns += ('queries',)
+        writer = RecordWriter(fmt, columns)
+        for issue in issue_list:
+            record = issue_export_record(issue)
+            if tags is not None:
+                record['queries'] = tags.get(issue.key, '')
+            writer.record(record)
+        writer.flush()
+        return
+
+    # no color if oneline is used
+    palette = palette_get(color and not oneline, tty)
+    out = BufferedWriter()
     for issue in issue_list:
-        # issue header
-        print(issue_header(issue))
         if oneline:
+            tag = ""
+            if tags is not None:
+                tag = " [%s]" % tags.get(issue.key, '')
+            out.write(issue_header(issue, palette) + tag + "\n")
             continue
-        # issue description
         desc_fields = issue_format(jira_obj, issue,
                                    show_desc=show_desc,
                                    show_comments=show_comments,
-                                   show_trans=show_trans)
-        print("\n".join(" : ".join((k.ljust(20), v))
-                        for k, v in desc_fields.items()) + "\n")
-
-
-def issue_search_result_print(jira_obj, args, searchstring_list):
-    """print issues for the given search string(s)"""
-    for searchstr in searchstring_list:
-        issues = jira_obj.search_issues(searchstr)
-        # FIXME: debug problem why comments are not available
-        # if I use jira_obj.search_issues()
-        # get issues again.
-        for i in issues:
-            issue = jira_obj.issue(i.key)
-            issue_list_print(jira_obj, [issue], args['issue_desc'],
-                             args['issue_comments'], args['issue_trans'],
-                             args['issue_oneline'])
-
-
-def filter_list_print(filter_list):
-    """print a list of filters"""
+                                   show_trans=show_trans,
+                                   transitions_cache=transitions_cache,
+                                   palette=palette)
+        if tags is not None:
+            desc_fields['queries'] = tags.get(issue.key, '')
+        out.write("%s\n%s\n\n" % (
+            issue_header(issue, palette),
+            "\n".join("%s : %s" % (k.ljust(20), v)
+                      for k, v in desc_fields.items())))
+    out.flush()
+
+
+def issue_search_expand(show_trans):
+    """get the expand parameter for a search so that the search result
+    already contains everything needed to print the issues"""
+    if show_trans:
+        return 'transitions'
+    return None
+
+
+def issue_search_iter(jira_obj, searchstr, limit=None, page_size=50,
+                      **kwargs):
+    """iterate over the issues for the given search string
+
+    The issues are fetched page by page (via startAt/maxResults) so the
+    first issues are available before the whole result was transferred.
+    Additional keyword arguments are passed to search_issues()."""
+    start_at = 0
+    while limit is None or start_at < limit:
+        max_results = page_size
+        if limit is not None:
+            max_results = min(page_size, limit - start_at)
+        issues = jira_obj.search_issues(searchstr, startAt=start_at,
+                                        maxResults=max_results, **kwargs)
+        for issue in issues:
+            yield issue
+        # the server may return less issues than requested per page
+        start_at += len(issues)
+        if len(issues) == 0 or start_at >= issues.total:
+            break
+
+
+def issues_search_multi(jira_obj, searchstring_list, jobs=1, limit=None,
+                        page_size=50, **kwargs):
+    """search the issues for several search strings concurrently
+
+    Only the keys are requested for every search. The issues are fetched
+    afterwards with 'key in (...)' searches (page_size issues per
+    search, paged if the server returns less issues per page), so issues
+    which match several searches are fetched only once. Additional
+    keyword arguments are passed to search_issues().
+
+    Returns a dict with the issues (in the order of the first match) and
+    a list with the matching keys for every search string."""
+    matches = []
+    for searchstr, keys, error in parallel_map(
+            lambda searchstr: [i.key for i in issue_search_iter(
+                jira_obj, searchstr, limit=limit, page_size=page_size,
+                fields='key')],
+            searchstring_list, jobs=jobs):
+        if error is not None:
+            raise error
+        matches.append(keys)
+    unique = list(OrderedDict.fromkeys(itertools.chain(*matches)))
+    chunks = [unique[i:i + page_size]
+              for i in range(0, len(unique), page_size)]
+    fetched = {}
+    for chunk, issues, error in parallel_map(
+            lambda chunk: list(issue_search_iter(
+                jira_obj, 'key in (%s)' % ", ".join(chunk),
+                page_size=len(chunk), validate_query=False, **kwargs)),
+            chunks, jobs=jobs):
+        if error is not None:
+            raise error
+        fetched.update((i.key, i) for i in issues)
+    # an issue may have been deleted (or moved) in the meantime
+    issues = OrderedDict((key, fetched[key]) for key in unique
+                         if key in fetched)
+    return issues, [[k for k in keys if k in issues] for keys in matches]
+
+
+def issue_search_result_print(jira_obj, args, searchstring_list,
+                              names=None):
+    """print issues for the given search string(s)
+
+    Several searches are merged (every issue is printed once, see
+    issues_search_multi()). With --search-mode tag every issue gets the
+    names of the searches which matched it (default: the search
+    strings), with --search-mode sections the issues of every search are
+    printed below its name"""
+    # request the printed fields (including the comments) and the
+    # needed expansions with the search so no issue needs to be
+    # fetched again
+    fields = issue_fields_get(args['fields'],
+                              comments=not comments_sliced(args))
+    search_args = {'fields': fields,
+                   'expand': issue_search_expand(args['issue_trans'])}
+    print_args = (args['issue_desc'], args['issue_comments'],
+                  args['issue_trans'], args['issue_oneline'])
+    print_kwargs = {'fmt': args['format'], 'color': not args['no_color'],
+                    'tty': args['tty']}
+    if len(searchstring_list) == 1:
+        issues = issue_search_iter(
+            jira_obj, searchstring_list[0], limit=args['limit'],
+            page_size=args['page_size'], **search_args)
+        issue_list_print(jira_obj,
+                         issues_comments_sliced(jira_obj, args, issues),
+                         *print_args, **print_kwargs)
+        return
+
+    issues, matches = issues_search_multi(
+        jira_obj, searchstring_list, jobs=args['jobs'], limit=args['limit'],
+        page_size=args['page_size'], **search_args)
+    # the comments are stored in the issues
+    list(issues_comments_sliced(jira_obj, args, issues.values()))
+    names = names or searchstring_list
+    mode = args['search_mode']
+    if mode == 'sections' and args['format'] == 'text':
+        for name, keys in zip(names, matches):
+            print("%s : %s issues\n" % (name, len(keys)))
+            issue_list_print(jira_obj, [issues[k] for k in keys],
+                             *print_args, **print_kwargs)
+        return
+    tags = None
+    # there are no sections in the records of the other formats
+    if mode != 'merge':
+        tags = {}
+        for name, keys in zip(names, matches):
+            for key in keys:
+                tags[key] = "%s | %s" % (tags[key], name) \
+                    if key in tags else name
+    issue_list_print(jira_obj, issues.values(), *print_args, tags=tags,
+                     **print_kwargs)
+
+
+def jql_quote(value):
+    """get a quoted JQL string for a value"""
+    return '"%s"' % value.replace('\\', '\\\\').replace('"', '\\"')
+
+
+def jql_projects(searchstr):
+    """get the project keys of a search string ('project = X' or
+    'project in (X, Y)')"""
+    m = re.search(r'\bproject\s*(?:=\s*"?([\w-]+)"?|in\s*\(([^)]*)\))',
+                  searchstr, re.I)
+    if m is None:
+        return []
+    if m.group(1):
+        return [m.group(1)]
+    return [p.strip().strip('"') for p in m.group(2).split(',') if p.strip()]
+
+
+def issue_count(jira_obj, searchstr, validate=True):
+    """get the number of issues for a search string without getting the
+    issues (maxResults=0)"""
+    params = {'jql': searchstr, 'maxResults': 0, 'fields': 'key'}
+    if not validate:
+        params['validateQuery'] = 'false'
+    return jira_obj._get_json('search', params=params)['total']
+
+
+def project_statuses_get(jira_obj, project):
+    """get the statuses (raw json) of the issue types of a project"""
+    statuses = OrderedDict()
+    for issuetype in jira_obj._get_json('project/%s/statuses' % project):
+        for status in issuetype['statuses']:
+            statuses.setdefault(status['name'], status)
+    return list(statuses.values())
+
+
+def assignable_users_get(jira_obj, project, page_size=50):
+    """get the users (raw json) who can be assigned to the issues of a
+    project"""
+    users = []
+    while True:
+        page = jira_obj._get_json('user/assignable/search', params={
+            'project': project, 'startAt': len(users),
+            'maxResults': page_size})
+        if not page:
+            return users
+        users.extend(page)
+
+
+def group_values_get(jira_obj, cache, field, searchstr):
+    """get the possible values of a --group-by field from the cached
+    metadata (of the projects of the search string if available).
+    Raises ValueError if they are not known"""
+    projects = jql_projects(searchstr)
+
+    def project_values(kind, func):
+        names = OrderedDict()
+        for project in projects:
+            names.update((m['name'], True) for m in metadata_get(
+                cache, '%s|%s' % (kind, project), lambda: func(project)))
+        return list(names)
+
+    if field == 'status':
+        if projects:
+            return project_values(
+                'statuses', lambda p: project_statuses_get(jira_obj, p))
+        return [s['name'] for s in metadata_get(
+            cache, 'statuses', lambda: jira_obj.statuses())]
+    if field == 'priority':
+        return [p['name'] for p in metadata_get(
+            cache, 'priorities', lambda: jira_obj.priorities())]
+    if field in ('component', 'assignee'):
+        if not projects:
+            raise ValueError("--group-by %s needs a project in the search "
+                             "string" % field)
+        if field == 'component':
+            return sorted(project_values(
+                'components', lambda p: jira_obj.project_components(p)))
+        return sorted(project_values(
+            'assignable', lambda p: assignable_users_get(jira_obj, p)))
+    raise ValueError("no values available for '%s'" % field)
+
+
+def issue_count_get(jira_obj, cache, searchstr, field=None, jobs=1,
+                    max_values=GROUP_BY_MAX_VALUES):
+    """count the issues for a search string per value of field (see
+    GROUP_BY_FIELDS)
+
+    Only the totals of searches with maxResults=0 are requested, a search
+    per value (in parallel) and one for the issues without a value. The
+    values of 'assignee' are the users who can be assigned to issues of
+    the projects (issues of other users are counted as '(other)', see
+    issue_count_print()). Raises ValueError if there are more than
+    max_values values.
+    Returns the total and a list of (value, count) tuples (the largest
+    count first, None is the value for issues without a value)."""
+    # the order does not matter and can't be part of the combined search
+    searchstr = re.sub(r'\s+order\s+by\s.*$', '', searchstr,
+                       flags=re.I | re.S)
+    total = issue_count(jira_obj, searchstr)
+    if field is None:
+        return total, []
+    values = group_values_get(jira_obj, cache, field, searchstr)
+    if len(values) > max_values:
+        raise ValueError("--group-by %s needs a search for each of the %s "
+                         "values (at most %s are allowed)" % (
+                             field, len(values), max_values))
+    searches = OrderedDict(
+        ('(%s) AND %s = %s' % (searchstr, field, jql_quote(v)), v)
+        for v in values)
+    searches['(%s) AND %s is EMPTY' % (searchstr, field)] = None
+    counts = {}
+    for search, count, error in parallel_map(
+            lambda search: issue_count(jira_obj, search, validate=False),
+            list(searches), jobs=jobs):
+        if error is not None:
+            raise error
+        if count:
+            counts[searches[search]] = count
+    return total, sorted(counts.items(), key=lambda c: -c[1])
+
+
+def issue_count_print(total, counts, field=None):
+    """print a table with the counts of issue_count_get(). For fields with
+    a single value per issue the issues without a counted value (ie.
+    assigned to users who are not assignable anymore) are shown as
+    '(other)'"""
+    import tabulate
+    if field is None:
+        print(total)
+        return
+    rows = [[value if value is not None else "(none)", count]
+            for value, count in counts]
+    other = total - sum(count for _, count in counts)
+    if field in GROUP_BY_SINGLE_FIELDS and other > 0:
+        rows.append(["(other)", other])
+    rows.append(["total", total])
+    print(tabulate.tabulate(rows, headers=[field, 'issues']))
+
+
+def issue_export_record(issue):
+    """get a dict (which can be serialized as json) for an issue
+
+    The values are taken as they are from the server (ie. the ISO
+    timestamps and the number of comments), lists are joined with ', '.
+    Fields which were not requested (see --fields) are empty."""
+    raw = issue.raw['fields']
+
+    def names(field, key='name'):
+        return ", ".join(v[key] for v in raw.get(field) or [])
+
+    record = OrderedDict()
+    record['key'] = issue.key
+    for name in ('issuetype', 'status', 'priority'):
+        record[name] = (raw.get(name) or {}).get('name', '')
+    record['summary'] = raw.get('summary') or ''
+    record['description'] = raw.get('description') or ''
+    record['parent'] = (raw.get('parent') or {}).get('key', '')
+    record['created'] = raw.get('created') or ''
+    for name in ('reporter', 'assignee'):
+        record[name] = (raw.get(name) or {}).get('name', '')
+    record['updated'] = raw.get('updated') or ''
+    record['versions'] = names('fixVersions')
+    record['components'] = names('components')
+    record['labels'] = ", ".join(raw.get('labels') or [])
+    record['attachment'] = names('attachment', 'filename')
+    # inward issue: the issue to link from
+    # outward issue: the issue to link to
+    record['issuelinks'] = ", ".join(
+        (link.get('outwardIssue') or link['inwardIssue'])['key']
+        for link in raw.get('issuelinks') or []
+        if 'outwardIssue' in link or 'inwardIssue' in link)
+    comment = raw.get('comment') or {}
+    record['comments'] = comment.get('total',
+                                     len(comment.get('comments', [])))
+    return record
+
+
+def issue_export(jira_obj, searchstr, path, jobs=1, page_size=50,
+                 fields=None):
+    """export all issues for the given search string to a JSONL file
+
+    The first page is used to get the total number of issues. The
+    remaining pages are fetched in parallel with the given number of
+    jobs (see parallel_map(), so only a few pages are kept in memory).
+    The issues are written in the order of the search result.
+    fields is passed to issue_fields_get().
+    Returns the number of exported issues."""
+    fields = issue_fields_get(fields)
+
+    def page_get(start_at):
+        return jira_obj.search_issues(searchstr, startAt=start_at,
+                                      maxResults=page_size, fields=fields)
+
+    first_page = page_get(0)
+    # the server may limit the page size
+    page_size = len(first_page) or page_size
+
+    def pages():
+        yield first_page
+        for _, page, error in parallel_map(
+                page_get, range(page_size, first_page.total, page_size),
+                jobs=jobs):
+            if error is not None:
+                raise error
+            yield page
+
+    count = 0
+    with open(path, 'w') as f:
+        writer = RecordWriter('jsonl', None, f)
+        for page in pages():
+            for issue in page:
+                writer.record(issue_export_record(issue))
+                count += 1
+        writer.flush()
+    return count
+
+
+def issues_file_parse(path):
+    """get (line number, summary, is_subtask) for every non empty line of
+    an --issues-create file. Lines starting with '*' or '-' are subtasks
+    of the previous issue"""
+    with open(path, "r") as f:
+        for lineno, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            if line[0] in ('*', '-'):
+                yield lineno, line[1:].strip(), True
+            else:
+                yield lineno, line, False
+
+
+def create_error_text(error):
+    """get the text for an error of the bulk create endpoint (a dict with
+    an error message per field)"""
+    if isinstance(error, dict):
+        return ", ".join("%s: %s" % (k, v) for k, v in sorted(error.items()))
+    return error_text(error)
+
+
+def issues_bulk_create(jira_obj, field_list, chunk_size=50):
+    """create issues (a list of field dicts) with the bulk create endpoint
+    in chunks of chunk_size issues. Returns a (key, error) tuple for every
+    field dict, key is None if the issue was not created"""
+    results = []
+    for start in range(0, len(field_list), chunk_size):
+        chunk = field_list[start:start + chunk_size]
+        try:
+            created = jira_obj.create_issues(chunk, prefetch=False)
+        except Exception as e:
+            results.extend([(None, create_error_text(e))] * len(chunk))
+            continue
+        for c in created:
+            if c['issue'] is not None:
+                results.append((c['issue'].key, None))
+            else:
+                results.append((None, create_error_text(c['error'])))
+    return results
+
+
+def issues_create(jira_obj, project, issue_type, subtask_type, lines,
+                  parent=None, chunk_size=50):
+    """create the issues for the parsed lines (see issues_file_parse())
+
+    All issues are created first, then the subtasks (with the keys of
+    their parents) so every phase needs only len(lines) / chunk_size
+    requests. parent is used for subtasks before the first issue.
+    Returns (line number, summary, key, error) for every line"""
+    lines = list(lines)
+    results = {}
+    field_list = [
+        {'project': {'key': project}, 'issuetype': {'name': issue_type},
+         'summary': summary}
+        for lineno, summary, is_subtask in lines if not is_subtask]
+    created = iter(issues_bulk_create(jira_obj, field_list, chunk_size))
+    for lineno, summary, is_subtask in lines:
+        if not is_subtask:
+            results[lineno] = next(created)
+
+    # the subtasks
+    subtasks = []
+    field_list = []
+    parent_lineno = None
+    for lineno, summary, is_subtask in lines:
+        if not is_subtask:
+            parent_lineno = lineno
+            parent = results[lineno][0]
+        elif parent is None:
+            if parent_lineno is None:
+                error = "no parent issue"
+            else:
+                error = "parent issue (line %s) was not created" % (
+                    parent_lineno)
+            results[lineno] = (None, error)
+        else:
+            subtasks.append(lineno)
+            field_list.append({
+                'project': {'key': project},
+                'issuetype': {'name': subtask_type},
+                'summary': summary,
+                'parent': {'key': parent}})
+    results.update(zip(subtasks,
+                       issues_bulk_create(jira_obj, field_list, chunk_size)))
+    return [(lineno, summary) + results[lineno]
+            for lineno, summary, is_subtask in lines]
+
+
+def filter_list_print(filter_list, fmt='text', color=True, tty=None):
+    """print a list of filters (raw json objects)"""
+    if fmt != 'text':
+        writer = RecordWriter(fmt, FILTER_RECORD_COLUMNS)
+        for f in filter_list:
+            writer.record(OrderedDict((
+                ('id', f['id']), ('name', f['name']),
+                ('owner', f.get('owner', {}).get('name', '')),
+                ('jql', f.get('jql', '')), ('url', f.get('viewUrl', '')),
+                ('description', f.get('description', '')))))
+        writer.flush()
+        return
+
+    palette = palette_get(color, tty)
     for f in filter_list:
         # header
-        print("%s" % (colorfunc("%s, %s" % (f.id,
-                                            f.name),
-                                None, attrs=['bold', 'underline'])))
+        print("%s%s, %s%s" % (palette['header'], f['id'], f['name'],
+                              palette['reset']))
         # fields to show for the filter
         fields = OrderedDict()
-        fields['Url'] = f.viewUrl
-        fields['description'] = getattr(f, 'description', '')
-        fields['owner'] = f.owner.name
-        fields['jql'] = f.jql
+        fields['Url'] = f.get('viewUrl')
+        fields['description'] = f.get('description', '')
+        fields['owner'] = f.get('owner', {}).get('name')
+        fields['jql'] = f.get('jql')
         # add empty strings if field not available
         for k, v in fields.items():
             if not v:
@@ -270,11 +1319,51 @@ def filter_list_print(filter_list):
                         for k, v in fields.items()) + "\n")
 
 
+def _non_negative_int(value):
+    """argparse type for integers greater than or equal to 0"""
+    number = int(value)
+    if number < 0:
+        raise argparse.ArgumentTypeError(
+            "%s is not a non-negative number" % value)
+    return number
+
+
+def _date(value):
+    """argparse type for a date (see date_parse()). The string is kept
+    so the arguments can be forwarded to a daemon"""
+    try:
+        date_parse(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+    return value
+
+
+def _positive_int(value):
+    """argparse type for integers greater than 0"""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(
+            "%s is not a positive number" % value)
+    return number
+
+
 def parse_args():
     """parse command line arguments"""
     parser = argparse.ArgumentParser()
     parser.add_argument('--debug', action='store_true',
                         help='print debug information (default: %(default)s)')
+    parser.add_argument('--daemon', action='store_true',
+                        help='keep a connection to the server and execute '
+                        'the commands of other jiracli calls (which are '
+                        'forwarded via a unix socket) '
+                        '(default: %(default)s)')
+    parser.add_argument('--trace-http', action='store_true',
+                        help='log every request (method, path, status, '
+                        'bytes and latency) and print a summary at exit')
+    parser.add_argument('--profile', action='store_true',
+                        help='profile the command and print the hot spots '
+                        'to stderr. Only the main thread is profiled, use '
+                        '--jobs 1 to include the requests')
     parser.add_argument("--no-verify", action='store_true',
                         help='do not verify the ssl certificate')
     parser.add_argument("--issue-type-list", action='store_true',
@@ -295,8 +1384,24 @@ def parse_args():
                         '--issue-create')
     parser.add_argument("--filter-list-fav", action='store_true',
                         help='list favourite filters')
+    parser.add_argument("-j", "--jobs", type=_positive_int, default=4,
+                        metavar='jobs',
+                        help='number of parallel requests to the server '
+                        '(default: %(default)s)')
+    parser.add_argument("--async", action='store_true', dest='use_async',
+                        help='send the requests for several issues (ie. '
+                        '--issue or --issue-trans-close) concurrently from '
+                        'a single thread, --jobs is the maximum number of '
+                        'concurrent requests (needs aiohttp)')
+    parser.add_argument("--export", nargs=2, metavar=('searchstring', 'file'),
+                        help='export all issues for the given search string '
+                        'to a file (one json object per line)')
     parser.add_argument("--no-color", action='store_true',
                         help='disable colorful output (default: %(default)s)')
+    parser.add_argument("--refresh", action='store_true',
+                        help='do not use cached metadata (ie. the project '
+                        'list) but get it from the server '
+                        '(default: %(default)s)')
     group_issue = parser.add_argument_group('issue')
     # create
     group_issue.add_argument('-c', '--issue-create', nargs=5,
@@ -324,6 +1429,45 @@ def parse_args():
     group_issue.add_argument('--issue-search-by-filter', nargs='+',
                              metavar='filter-id',
                              help='search for issues by filter-id.')
+    group_issue.add_argument('--limit', type=_non_negative_int,
+                             metavar='limit',
+                             help='maximum number of issues to show per '
+                             'search (default: no limit)')
+    group_issue.add_argument('--page-size', type=_positive_int, default=50,
+                             metavar='page-size',
+                             help='number of issues to fetch per request '
+                             'when searching (default: %(default)s)')
+    group_issue.add_argument('--issue-count', nargs=1,
+                             metavar='searchstring',
+                             help='print the number of issues for the '
+                             'search string (without getting the issues)')
+    group_issue.add_argument('--group-by', choices=GROUP_BY_FIELDS,
+                             help='count the issues per value of the field '
+                             'for --issue-count. component and assignee '
+                             'need a project in the search string')
+    group_issue.add_argument('--search-mode', choices=SEARCH_MODES,
+                             default='merge',
+                             help='how the results of several searches '
+                             '(--issue-search and --issue-search-by-filter) '
+                             'are printed: merge prints every issue once, '
+                             'tag also prints the searches which matched '
+                             'and sections prints the issues of every '
+                             'search below it (only for --format text, '
+                             'the other formats are tagged). The searches '
+                             'run in parallel and every issue is fetched '
+                             'once (default: %(default)s)')
+    parser.add_argument('--format', choices=('text',) + FORMATS,
+                        default='text',
+                        help='output format for issues and filters. jsonl, '
+                        'csv and tsv write one record per line '
+                        '(default: %(default)s)')
+    group_issue.add_argument('--fields', metavar='fields',
+                             help='comma separated list of the fields to '
+                             'request for --issue, --issue-search and '
+                             '--export (ie. "summary,status,customfield_1",'
+                             ' or "*all"). The fields needed for the issue '
+                             'header are always requested. By default only '
+                             'the fields which are shown are requested')
     group_issue.add_argument('--issue-desc', action='store_true',
                              help='show issue description '
                              '(default: %(default)s)')
@@ -341,7 +1485,39 @@ def parse_args():
     group_issue.add_argument('--sprint', nargs=1, metavar='project',
                              help='show open sprint for project.')
 
+    # local mirror
+    group_issue.add_argument('--sync', nargs='+', metavar='project',
+                             help='update the local mirror with the issues '
+                             'of the given project(s)')
+    group_issue.add_argument('--offline', action='store_true',
+                             help='use the local mirror (see --sync) for '
+                             '--issue, --issue-search and --sprint. '
+                             '--issue-search only supports a JQL subset '
+                             '(default: %(default)s)')
+
     # comments
+    group_issue.add_argument('--comments-last', type=_non_negative_int,
+                             metavar='n',
+                             help='show only the last n comments for '
+                             '--issue and --issue-search. Only these '
+                             'comments are requested from the server, 0 '
+                             'only requests the number of comments')
+    group_issue.add_argument('--comments-since', type=_date,
+                             metavar='date',
+                             help='show only the comments created since '
+                             'the date ("YYYY-MM-DD" or "YYYY-MM-DD HH:MM") '
+                             'for --issue and --issue-search. Can be '
+                             'combined with --comments-last')
+    # attachments
+    group_issue.add_argument('--issue-attachments-get', nargs='+',
+                             metavar='issue',
+                             help='download the attachments of the given '
+                             'issue(s) to <dest>/<issue>/ (see --dest and '
+                             '--jobs). Complete files are skipped and '
+                             'partial downloads are continued')
+    group_issue.add_argument('--dest', default='.', metavar='dir',
+                             help='directory for --issue-attachments-get '
+                             '(default: %(default)s)')
     group_issue.add_argument('--issue-comment-add', nargs=1,
                              metavar='issue-key',
                              help='add a comment to given issue.')
@@ -349,18 +1525,22 @@ def parse_args():
     # labels
     group_issue.add_argument("--issue-label-add", nargs=2,
                              metavar=('issue', 'label'),
-                             help='Add a label to the given issue')
+                             help='Add label(s) to the given issue(s). '
+                             'Both are comma separated lists')
     group_issue.add_argument("--issue-label-remove", nargs=2,
                              metavar=('issue', 'label'),
-                             help='Remove a label from the given issue')
+                             help='Remove label(s) from the given issue(s). '
+                             'Both are comma separated lists')
 
     # components
     group_issue.add_argument("--issue-component-add", nargs=2,
                              metavar=('issue', 'component'),
-                             help='Add a component to the given issue')
+                             help='Add component(s) to the given issue(s). '
+                             'Both are comma separated lists')
     group_issue.add_argument("--issue-component-remove", nargs=2,
                              metavar=('issue', 'component'),
-                             help='Remove a component from the given issue')
+                             help='Remove component(s) from the given '
+                             'issue(s). Both are comma separated lists')
     # transitions
     group_issue.add_argument("--issue-trans-open", nargs='+', metavar='issue',
                              help='Move issue(s) to Open state')
@@ -385,23 +1565,63 @@ def parse_args():
                              metavar=('issue', 'assignee'),
                              help='Assign the issue to the specified user')
     # fix versions
-    group_issue.add_argument("--issue-fix-version-add", nargs='+',
-                             metavar='issue',
-                             help='Add fix version to the given issue(s)')
-    group_issue.add_argument("--issue-fix-version-remove", nargs='+',
-                             metavar='issue',
-                             help='Remove fix version from the given issue(s)')
+    group_issue.add_argument("--issue-fix-version-add", nargs=2,
+                             metavar=('issue', 'version'),
+                             help='Add fix version(s) to the given issue(s). '
+                             'Both are comma separated lists')
+    group_issue.add_argument("--issue-fix-version-remove", nargs=2,
+                             metavar=('issue', 'version'),
+                             help='Remove fix version(s) from the given '
+                             'issue(s). Both are comma separated lists')
 
     group_issue.add_argument("--issue-parent",
                              help='Parent Issue Key of the Subtask. '
                              'Required for Subtasks.')
-    return vars(parser.parse_args())
+    args = vars(parser.parse_args())
+    # the output of a command forwarded to the daemon goes to the terminal
+    # of the client
+    args['tty'] = stdout_isatty()
+    # the sliced comments are shown (--comments-last 0 only counts them)
+    if args['comments_since'] is not None or args['comments_last']:
+        args['issue_comments'] = True
+    return args
+
+
+def daemon_forwardable(args):
+    """check if the command (the parsed arguments) can be executed by a
+    daemon"""
+    # options which change the client, the cache or the logging
+    if args['debug'] or args['no_verify'] or args['refresh'] or \
+            args['trace_http'] or args['profile']:
+        return False
+    # commands which need an editor
+    if args['issue_create'] and args['description'] is None:
+        return False
+    if args['issue_comment_add'] and not args['message']:
+        return False
+    return True
 
 
 def main():
-    global LOG
     args = parse_args()
-    setup_logging(LOG, args['debug'])
+    if args['profile']:
+        profile_run(main_run, args)
+    else:
+        main_run(args)
+
+
+def main_run(args):
+    """execute the command given by the parsed arguments (forwarded to
+    a daemon if possible)"""
+    setup_logging(LOG, args['debug'], args['trace_http'])
+
+    # execute the command in a running daemon (if there is one)
+    if not args['daemon'] and daemon_forwardable(args):
+        from .daemon import daemon_forward, daemon_socket_path
+        exit_code = daemon_forward(daemon_socket_path(), args)
+        if exit_code is not None:
+            sys.exit(exit_code)
+
     conf = config_get(user_config_path)
 
     # Override config setting if user requested to ignore ssl cert verification
@@ -411,133 +1631,168 @@ def main():
     # disable urllib3 InsecureRequestWarning warnings
     verify = conf.getboolean('defaults', 'verify')
     if not verify:
-        requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
-
-    jira_obj = jira_obj_get(conf)
-
+        import urllib3
+        urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+    # cached metadata which rarely changes
+    cache_dir = cache_dir_get(conf.get('defaults', 'url'),
+                              conf.get('defaults', 'user'))
+    cache_ttl = 0 if args['refresh'] else conf.getint('defaults', 'cache_ttl')
+    transitions_cache = Cache(os.path.join(cache_dir, 'transitions.json'),
+                              cache_ttl)
+    atexit.register(transitions_cache.save)
+    metadata_cache = Cache(os.path.join(cache_dir, 'metadata.json'),
+                           cache_ttl)
+    atexit.register(metadata_cache.save)
+
+    # the client is only created if a command talks to the server
+    session_path = None
+    if conf.getboolean('defaults', 'session_cache'):
+        session_path = user_session_path
+    trace = None
+    if args['trace_http']:
+        trace = HttpTrace()
+        atexit.register(lambda: sys.stderr.write(trace.summary()))
+    # conditional request cache for GET responses (size in MiB)
+    http_cache_size = conf.getint('defaults', 'http_cache_size') * 1024 * 1024
+    limiter = None
+    if args['daemon']:
+        # the maximum is set to the --jobs of every forwarded command
+        from .ratelimit import AIMDLimiter
+        limiter = AIMDLimiter(args['jobs'])
+    jira_obj = LazyJIRA(lambda: jira_obj_get(
+        conf, jobs=args['jobs'], cache=metadata_cache,
+        session_path=session_path,
+        http_cache_path=os.path.join(cache_dir, 'http'),
+        http_cache_size=http_cache_size, trace=trace,
+        max_retries=conf.getint('defaults', 'max_retries'),
+        limiter=limiter))
+
+    # keep the client and the caches and execute the forwarded commands
+    if args['daemon']:
+        def daemon_command_run(daemon_args):
+            limiter.max_limit_set(daemon_args['jobs'])
+            try:
+                return commands_run(jira_obj, conf, daemon_args,
+                                    transitions_cache, metadata_cache)
+            finally:
+                transitions_cache.save()
+                metadata_cache.save()
+        from .daemon import daemon_serve, daemon_socket_path
+        ok = daemon_serve(daemon_socket_path(), daemon_command_run)
+        sys.exit(0 if ok else 1)
+
+    commands_run(jira_obj, conf, args, transitions_cache, metadata_cache)
+
+
+def commands_run(jira_obj, conf, args, transitions_cache, metadata_cache):
+    """execute the command given by the parsed arguments"""
     # use colorful output?
-    if args['no_color']:
-        global colorfunc
-        colorfunc = lambda *a, **k: str(a[0])
+    color = not args['no_color']
+    tty = args['tty']
 
     # print issue link types
     if args['issue_link_types_list']:
         # print("%s%s%s" % ("name".ljust(30), "inward".ljust(25),
         # "outward".ljust(25)))
-        for i in jira_obj.issue_link_types():
-            print("%s%s%s" % (i.name.ljust(30),
-                              i.inward.ljust(25), i.outward.ljust(25)))
+        for i in metadata_get(metadata_cache, 'issue_link_types',
+                              lambda: jira_obj.issue_link_types()):
+            print("%s%s%s" % (i['name'].ljust(30),
+                              i['inward'].ljust(25), i['outward'].ljust(25)))
         sys.exit(0)
 
     # print project list and exit
     if args['project_list']:
-        for p in jira_obj.projects():
-            print(p.id.ljust(10), p.key.ljust(10), p.name.ljust(30))
+        for p in metadata_get(metadata_cache, 'projects',
+                              lambda: jira_obj.projects()):
+            print(p['id'].ljust(10), p['key'].ljust(10), p['name'].ljust(30))
         sys.exit(0)
 
     # print issue types
     if args['issue_type_list']:
-        for it in jira_obj.issue_types():
-            print(it.id.ljust(10), it.name.ljust(30), it.description.ljust(10))
+        for it in metadata_get(metadata_cache, 'issue_types',
+                               lambda: jira_obj.issue_types()):
+            print(it['id'].ljust(10), it['name'].ljust(30),
+                  it.get('description', '').ljust(10))
         sys.exit(0)
 
     # print project components
     if args['project_list_components']:
         for pro in args['project_list_components']:
-            components = jira_obj.project_components(pro)
-            [print(c.id.ljust(10), c.name) for c in components]
+            components = metadata_get(
+                metadata_cache, 'components|%s' % pro,
+                lambda: jira_obj.project_components(pro))
+            [print(c['id'].ljust(10), c['name']) for c in components]
         sys.exit(0)
 
     # print favourite filters for current user
     if args['filter_list_fav']:
-        filter_list_print(jira_obj.favourite_filters())
-        sys.exit(0)
-
-    # add a label to an issue
-    if args['issue_label_add']:
-        issue = jira_obj.issue(args['issue_label_add'][0])
-        issue.fields.labels.append(args['issue_label_add'][1])
-        issue.update(fields={"labels": issue.fields.labels})
-        sys.exit(0)
-
-    # remove label from an issue
-    if args['issue_label_remove']:
-        issue = jira_obj.issue(args['issue_label_remove'][0])
-        labels_new = filter(
-            lambda x: x.lower() != args['issue_label_remove'][1].lower(),
-            issue.fields.labels)
-        issue.update(fields={"labels": labels_new})
-        sys.exit(0)
-
-    # add component to an issue
-    if args['issue_component_add']:
-        issue = jira_obj.issue(args['issue_component_add'][0])
-        comp = {'name': args['issue_component_add'][1]}
-        components_available = [{'name': c.name}
-                                for c in issue.fields.components]
-        components_available.append(comp)
-        issue.update(fields={"components": components_available})
-        sys.exit(0)
-
-    # remove component from an issue
-    if args['issue_component_remove']:
-        issue = jira_obj.issue(args['issue_component_remove'][0])
-        r = args['issue_component_remove'][1].lower()
-        components_new = [
-            {'name': x.name}
-            for x in filter(
-                lambda x: x.name.lower() != r,
-                issue.fields.components
-            )
-        ]
-        issue.update(fields={"components": components_new})
-        sys.exit(0)
-
-    # add a fixVersion to an issue
-    if args['issue_fix_version_add']:
-        issue = jira_obj.issue(args['issue_fix_version_add'][0])
-        fix_version_new = {'name': args['issue_fix_version_add'][1]}
-        fix_versions_available = [
-            {'name': c.name} for c in issue.fields.fixVersions]
-        fix_versions_available.append(fix_version_new)
-        issue.update(fields={"fixVersions": fix_versions_available})
+        filter_list_print(metadata_get(metadata_cache, 'favourite_filters',
+                                       lambda: jira_obj.favourite_filters()),
+                          fmt=args['format'], color=color, tty=tty)
         sys.exit(0)
 
-    # remove fixVersion from an issue
-    if args['issue_fix_version_remove']:
-        issue = jira_obj.issue(args['issue_fix_version_remove'][0])
-        r = args['issue_fix_version_remove'][1].lower()
-        fix_versions_new = [
-            {'name': x.name} for x in filter(
-                lambda x: x.name.lower() != r,
-                issue.fields.fixVersions)]
-        issue.update(fields={"fixVersions": fix_versions_new})
-        sys.exit(0)
+    # add/remove labels, components and fix versions to/from issues
+    for arg, field, operation in (
+            ('issue_label_add', 'labels', 'add'),
+            ('issue_label_remove', 'labels', 'remove'),
+            ('issue_component_add', 'components', 'add'),
+            ('issue_component_remove', 'components', 'remove'),
+            ('issue_fix_version_add', 'fixVersions', 'add'),
+            ('issue_fix_version_remove', 'fixVersions', 'remove')):
+        if args[arg]:
+            issues, values = [[v for v in a.split(',') if v]
+                              for a in args[arg]]
+            if not issues or not values:
+                LOG.error("--%s needs at least one issue and one value",
+                          arg.replace('_', '-'))
+                sys.exit(1)
+            ok = issues_field_edit(jira_obj, issues, field, operation,
+                                   values, jobs=args['jobs'])
+            sys.exit(0 if ok else 1)
+
+    user = conf.get('defaults', 'user')
+
+    # send the requests for several issues from a single thread
+    client = None
+    if args['use_async']:
+        try:
+            client = async_client_get(conf, args['jobs'])
+        except ImportError:
+            LOG.error("--async needs the aiohttp module")
+            sys.exit(1)
 
     # move issue(s) to Open state
     if args['issue_trans_open']:
-        for i in args['issue_trans_open']:
-            jira_obj.transition_issue(i, 3)
-            LOG.debug("moved to open : issue '%s'", i)
-        sys.exit(0)
+        ok = issues_transition(jira_obj, args['issue_trans_open'], 'open',
+                               cache=transitions_cache, jobs=args['jobs'],
+                               client=client)
+        sys.exit(0 if ok else 1)
 
     # move issue(s) to Start Progress state
     if args['issue_trans_start']:
-        for i in args['issue_trans_start']:
-            # if somebody starts to work on an issue, assign it also
-            jira_obj.assign_issue(i, conf.get('defaults', 'user'))
-            jira_obj.transition_issue(i, 4)
-            LOG.debug("moved to progress : issue '%s'", i)
-        sys.exit(0)
+        # if somebody starts to work on an issue, assign it also
+        ok = issues_transition(jira_obj, args['issue_trans_start'],
+                               'progress',
+                               cache=transitions_cache, jobs=args['jobs'],
+                               assignee=user, client=client)
+        sys.exit(0 if ok else 1)
 
     # move issue(s) to Start Resolved state
     if args['issue_trans_resolve']:
-        for i in args['issue_trans_resolve']:
-            # jira_obj.transition_issue(i, 5, assignee={'name': conf['user']},
-            # resolution={'id': '1'})
-            jira_obj.transition_issue(i, 5, resolution={'id': '1'})
-            LOG.debug("moved to progress : issue '%s'", i)
-        sys.exit(0)
+        ok = issues_transition(jira_obj, args['issue_trans_resolve'],
+                               'resolved', cache=transitions_cache,
+                               jobs=args['jobs'], client=client,
+                               resolution={'id': '1'})
+        sys.exit(0 if ok else 1)
+
+    # move issue(s) to Closed state
+    if args['issue_trans_close']:
+        ok = issues_transition(jira_obj, args['issue_trans_close'],
+                               'closed',
+                               cache=transitions_cache, jobs=args['jobs'],
+                               client=client)
+        sys.exit(0 if ok else 1)
 
     # move a single issue to a custom state
     if args['issue_trans_custom']:
@@ -546,19 +1801,22 @@ def main():
         LOG.debug("moved to state number %s : issue '%s'", state, issue)
         sys.exit(0)
 
+    # the client has the same methods (but coroutines) for watchers
+    api = jira_obj if client is None else client
+
     # add watch to issue(s)
     if args['issue_watch_add']:
-        for i in args['issue_watch_add']:
-            jira_obj.add_watcher(i, conf.get('defaults', 'user'))
-            LOG.debug("added watch for issue '%s'", i)
-        sys.exit(0)
+        ok = bulk_execute(lambda i: api.add_watcher(i, user),
+                          args['issue_watch_add'], jobs=args['jobs'],
+                          action='added watch', client=client)
+        sys.exit(0 if ok else 1)
 
     # remove watch to issue(s)
     if args['issue_watch_remove']:
-        for i in args['issue_watch_remove']:
-            jira_obj.remove_watcher(i, conf.get('defaults', 'user'))
-            LOG.debug("removed watch for issue '%s'", i)
-        sys.exit(0)
+        ok = bulk_execute(lambda i: api.remove_watcher(i, user),
+                          args['issue_watch_remove'], jobs=args['jobs'],
+                          action='removed watch', client=client)
+        sys.exit(0 if ok else 1)
 
     # assign the issue
     if args['issue_assign']:
@@ -574,20 +1832,44 @@ def main():
             comment = editor_get_text(
                 "-- your comment for issue %s" %
                 (args['issue_comment_add'][0]))
-        issue = jira_obj.issue(args['issue_comment_add'][0])
-        jira_obj.add_comment(issue, comment)
+        # the issue key is enough, no need to get the issue
+        jira_obj.add_comment(args['issue_comment_add'][0], comment)
         LOG.debug("comment added to issue '%s'", args['issue_comment_add'][0])
         sys.exit(0)
 
     # print issue by filter search
     if args['issue_search_by_filter']:
-        searchstring_list = [
-            jira_obj.filter(f).jql for f in args['issue_search_by_filter']]
-        issue_search_result_print(jira_obj, args, searchstring_list)
+        filters = args['issue_search_by_filter']
+        searchstring_list = []
+        for f, jql, error in parallel_map(lambda f: jira_obj.filter(f).jql,
+                                          filters, jobs=args['jobs']):
+            if error is not None:
+                LOG.error("can not get filter '%s': %s", f,
+                          error_text(error))
+                sys.exit(1)
+            searchstring_list.append(jql)
+        issue_search_result_print(jira_obj, args, searchstring_list,
+                                  names=['filter %s' % f for f in filters])
         sys.exit(0)
 
     # create a new issue
     if args['issue_create']:
+        # check the issue type and the components before doing anything
+        project_key, issue_type = args['issue_create'][0:2]
+        components = [c for c in args['issue_create'][4].split(',') if c]
+        ok = metadata_names_check(
+            metadata_get(metadata_cache, 'issue_types',
+                         lambda: jira_obj.issue_types()),
+            [issue_type], 'issue type')
+        if components:
+            ok &= metadata_names_check(
+                metadata_get(
+                    metadata_cache, 'components|%s' % project_key,
+                    lambda: jira_obj.project_components(project_key)),
+                components, 'component')
+        if not ok:
+            sys.exit(1)
+
         # get description from text editor when command line parameter
         # was not given
         desc = args['description']
@@ -604,75 +1886,152 @@ def main():
         if len(args['issue_create'][3]) > 0:
             issue_dict['labels'] = args['issue_create'][3].split(',')
 
-        if len(args['issue_create'][4]) > 0:
-            issue_dict['components'] = [
-                {'name': c} for c in args['issue_create'][4].split(',')]
+        if components:
+            issue_dict['components'] = [{'name': c} for c in components]
 
         if args['issue_parent']:
             issue_dict['parent'] = {'id': args['issue_parent']}
 
         new_issue = jira_obj.create_issue(fields=issue_dict)
-        issue_list_print(jira_obj, [new_issue], True, True, False, False)
+        issue_list_print(jira_obj, [new_issue], True, True, False, False,
+                         color=color, tty=tty)
         sys.exit(0)
 
+    # download the attachments of issue(s)
+    if args['issue_attachments_get']:
+        ok = issues_attachments_get(jira_obj, args['issue_attachments_get'],
+                                    args['dest'], jobs=args['jobs'])
+        sys.exit(0 if ok else 1)
+
     # create multiple new issues from file
     if args['issues_create']:
-        # parent key (ie PROJECT-1234)
-        parent_id = None
-
-        if args['issue_parent']:
-            parent_id = args['issue_parent']
-
-        with open(args['issues_create'][3], "r") as f:
-            for n in f.readlines():
-                is_subtask = False
-                # ignore empty lines
-                if len(n) == 0:
-                    continue
-
-                issue_dict = {
-                    'project': {'key': args['issues_create'][0]},
-                }
-
-                if n.lstrip().startswith("*") or n.lstrip().startswith("-"):
-                    #  this is a subtask
-                    issue_dict['parent'] = {'id': parent_id}
-                    issue_dict['issuetype'] = {
-                        'name': args['issues_create'][2]}
-                    issue_dict['summary'] = n.lstrip()[1:]
-                    is_subtask = True
-                else:
-                    # this is a task without a parent
-                    issue_dict['issuetype'] = {
-                        'name': args['issues_create'][1]}
-                    issue_dict['summary'] = n
-
-                # create and print the new issue
-                new_issue = jira_obj.create_issue(fields=issue_dict)
-                issue_list_print(jira_obj, [new_issue],
-                                 True, True, False, False)
-                if not is_subtask:
-                    parent_id = new_issue.key
+        project, issue_type, subtask_type, path = args['issues_create']
+        results = issues_create(jira_obj, project, issue_type, subtask_type,
+                                issues_file_parse(path),
+                                parent=args['issue_parent'])
+        created = 0
+        for lineno, summary, key, error in results:
+            if key is not None:
+                print("%s : %s" % (key.ljust(20), summary))
+                created += 1
+            else:
+                LOG.error("line %s : failed: %s", lineno, error)
+        print("%s of %s issues created" % (created, len(results)))
+        sys.exit(0 if created == len(results) else 1)
+
+    # update the local mirror
+    if args['sync']:
+        from .mirror import mirror_open, mirror_sync
+        conn = mirror_open(mirror_path_get(conf))
+        for project in args['sync']:
+            count = mirror_sync(conn, jira_obj, project, issue_search_iter,
+                                page_size=args['page_size'])
+            print("%s : %s issues updated" % (project.ljust(20), count))
+        sys.exit(0)
 
+    # export issues to a file
+    if args['export']:
+        searchstr, path = args['export']
+        count = issue_export(jira_obj, searchstr, path, jobs=args['jobs'],
+                             page_size=args['page_size'],
+                             fields=args['fields'])
+        LOG.debug("exported %s issues to '%s'", count, path)
         sys.exit(0)
 
     # print issue search results
+    if args['issue_search'] and args['offline']:
+        from .mirror import mirror_open, mirror_search
+        conn = mirror_open(mirror_path_get(conf))
+        for searchstr in args['issue_search']:
+            try:
+                raw_issues = list(mirror_search(conn, searchstr, user=user,
+                                                limit=args['limit']))
+            except ValueError as e:
+                LOG.error("%s", e)
+                sys.exit(1)
+            issue_list_print(jira_obj, map(issue_from_raw, raw_issues),
+                             args['issue_desc'], args['issue_comments'],
+                             False, args['issue_oneline'],
+                             fmt=args['format'], color=color, tty=tty)
+        sys.exit(0)
+
     if args['issue_search']:
         issue_search_result_print(jira_obj, args, args['issue_search'])
         sys.exit(0)
 
+    # count the issues (per value of a field)
+    if args['issue_count']:
+        try:
+            total, counts = issue_count_get(
+                jira_obj, metadata_cache, args['issue_count'][0],
+                field=args['group_by'], jobs=args['jobs'])
+        except ValueError as e:
+            LOG.error("%s", e)
+            sys.exit(1)
+        issue_count_print(total, counts, field=args['group_by'])
+        sys.exit(0)
+
+    if args['sprint'] and args['offline']:
+        from .mirror import mirror_open, mirror_sprint
+        conn = mirror_open(mirror_path_get(conf))
+        sprint_print(map(issue_from_raw,
+                         mirror_sprint(conn, args['sprint'][0])))
+        sys.exit(0)
+
     if args['sprint']:
         sprint(jira_obj, args['sprint'][0])
         sys.exit(0)
 
+    # print issue(s) from the local mirror
+    if args['issue'] and args['offline']:
+        from .mirror import mirror_issues_get, mirror_open
+        conn = mirror_open(mirror_path_get(conf))
+        issues = []
+        for key, raw in zip(args['issue'],
+                            mirror_issues_get(conn, args['issue'])):
+            if raw is None:
+                LOG.error("issue '%s' is not available in the mirror", key)
+            else:
+                issues.append(issue_from_raw(raw))
+        issue_list_print(jira_obj, issues, args['issue_desc'],
+                         args['issue_comments'], False,
+                         args['issue_oneline'], fmt=args['format'],
+                         color=color, tty=tty)
+        sys.exit(0 if len(issues) == len(args['issue']) else 1)
+
     # print issue(s) and exit
     if args['issue']:
-        issues = [jira_obj.issue(i) for i in args['issue']]
+        failed = []
+        fields = issue_fields_get(args['fields'],
+                                  comments=not comments_sliced(args))
+
+        # the issues are printed as soon as they are available
+        def issues_get():
+            if client is None:
+                results = parallel_map(
+                    lambda key: jira_obj.issue(key, fields=fields),
+                    args['issue'], jobs=args['jobs'])
+            else:
+                results = (
+                    (key, raw and issue_from_raw(raw), error)
+                    for key, raw, error in client.map(
+                        lambda key: client.issue(key, fields=fields),
+                        args['issue']))
+            for key, issue, error in results:
+                if error is not None:
+                    LOG.error("can not get issue '%s': %s", key,
+                              error_text(error))
+                    failed.append(key)
+                else:
+                    yield issue
+
         issue_list_print(
-            jira_obj,
-            issues, args['issue_desc'], args['issue_comments'],
-            args['issue_trans'], args['issue_oneline'])
-        sys.exit(0)
+            jira_obj, issues_comments_sliced(jira_obj, args, issues_get()),
+            args['issue_desc'], args['issue_comments'],
+            args['issue_trans'], args['issue_oneline'],
+            transitions_cache=transitions_cache, fmt=args['format'],
+            color=color, tty=tty)
+        sys.exit(1 if failed else 0)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""an asyncio client for the commands with many issues (see --async)
+
+A single thread sends hundreds of concurrent requests instead of a thread
+per request. Only the requests which jiracli needs are available, they
+return the json of the response (no jira resources). Needs aiohttp."""
+
+import asyncio
+import base64
+import json
+
+import aiohttp
+
+from .ratelimit import FAILED, IDEMPOTENT, THROTTLED, retry_delay
+
+
+class AsyncJiraError(Exception):
+    """an error response of the server"""
+
+    def __init__(self, status_code, url, text):
+        super(AsyncJiraError, self).__init__(
+            "%s %s: %s" % (status_code, url, text))
+        self.status_code = status_code
+        self.url = url
+        self.text = text
+
+
+def _error_text(body):
+    """get the error messages of an error response"""
+    try:
+        data = json.loads(body)
+    except ValueError:
+        return body
+    if not isinstance(data, dict):
+        return body
+    messages = list(data.get('errorMessages', []))
+    messages.extend("%s: %s" % e for e in data.get('errors', {}).items())
+    return ", ".join(messages) or body
+
+
+class AsyncJira(object):
+    """a client for the REST API of the server with at most concurrency
+    requests at once. Throttled requests are retried (see ratelimit)"""
+
+    def __init__(self, url, user, password, verify=True, concurrency=100,
+                 max_retries=5, backoff=0.5):
+        self.url = url.rstrip('/') + '/rest/api/2/'
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.backoff = backoff
+        credentials = ("%s:%s" % (user, password)).encode('utf-8')
+        self._authorization = 'Basic %s' % base64.b64encode(
+            credentials).decode('ascii')
+        self._verify = verify
+        self._session = None
+
+    def _session_get(self):
+        # the session belongs to the running event loop (see map())
+        if self._session is None:
+            connector_args = {'limit': self.concurrency}
+            if not self._verify:
+                connector_args['ssl'] = False
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(**connector_args),
+                headers={'Authorization': self._authorization,
+                         'Content-Type': 'application/json',
+                         'Accept': 'application/json'})
+        return self._session
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def _request(self, method, path, params=None, data=None):
+        url = self.url + path
+        body = None if data is None else json.dumps(data)
+        # see ratelimit for the requests which are sent again
+        retry = THROTTLED + (FAILED if method in IDEMPOTENT else ())
+        for attempt in range(self.max_retries + 1):
+            async with self._session_get().request(
+                    method, url, params=params, data=body) as response:
+                text = await response.text()
+                if response.status not in retry or \
+                        attempt == self.max_retries:
+                    break
+                delay = retry_delay(attempt, response, self.backoff)
+            await asyncio.sleep(delay)
+        if response.status >= 400:
+            raise AsyncJiraError(response.status, url, _error_text(text))
+        return json.loads(text) if text else None
+
+    async def search(self, jql, fields=None, start_at=0, max_results=50,
+                     expand=None):
+        params = {'jql': jql, 'startAt': start_at,
+                  'maxResults': max_results}
+        if fields:
+            params['fields'] = fields
+        if expand:
+            params['expand'] = expand
+        return await self._request('GET', 'search', params=params)
+
+    async def issue(self, key, fields=None, expand=None):
+        params = {}
+        if fields:
+            params['fields'] = fields
+        if expand:
+            params['expand'] = expand
+        return await self._request('GET', 'issue/%s' % key, params=params)
+
+    async def transitions(self, key):
+        result = await self._request('GET', 'issue/%s/transitions' % key)
+        return result['transitions']
+
+    async def transition_issue(self, key, transition_id, **fields):
+        await self._request('POST', 'issue/%s/transitions' % key,
+                            data={'transition': {'id': transition_id},
+                                  'fields': fields})
+
+    async def assign_issue(self, key, assignee):
+        await self._request('PUT', 'issue/%s/assignee' % key,
+                            data={'name': assignee})
+
+    async def add_watcher(self, key, user):
+        await self._request('POST', 'issue/%s/watchers' % key, data=user)
+
+    async def remove_watcher(self, key, user):
+        await self._request('DELETE', 'issue/%s/watchers' % key,
+                            params={'username': user})
+
+    async def add_comment(self, key, body):
+        return await self._request('POST', 'issue/%s/comment' % key,
+                                   data={'body': body})
+
+    async def create_issue(self, fields):
+        return await self._request('POST', 'issue', data={'fields': fields})
+
+    def map(self, func, items):
+        """call the coroutine function func for every item (at most
+        concurrency calls at once) in an event loop
+
+        Returns a list of (item, result, error) tuples in the order of the
+        given items (like jiracli.parallel_map())."""
+        async def run():
+            semaphore = asyncio.Semaphore(self.concurrency)
+
+            async def call(item):
+                async with semaphore:
+                    try:
+                        return item, await func(item), None
+                    except Exception as e:
+                        return item, None, e
+
+            try:
+                return await asyncio.gather(*[call(i) for i in items])
+            finally:
+                await self.close()
+
+        return asyncio.run(run())
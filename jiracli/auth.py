@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import logging
+
+from requests.auth import AuthBase, _basic_auth_str
+from requests.cookies import extract_cookies_to_jar
+
+
+LOG = logging.getLogger('jiracli')
+
+
+def cookies_from_jar(jar):
+    """get a list of dicts (which can be serialized as json) for the
+    cookies in a cookie jar"""
+    return [{'name': c.name, 'value': c.value, 'domain': c.domain,
+             'path': c.path, 'secure': c.secure, 'expires': c.expires}
+            for c in jar]
+
+
+def cookies_to_jar(jar, cookies):
+    """add the cookies (from cookies_from_jar()) to the cookie jar"""
+    for c in cookies:
+        jar.set(c['name'], c['value'], domain=c['domain'], path=c['path'],
+                secure=c['secure'], expires=c['expires'])
+
+
+class CookieFallbackAuth(AuthBase):
+    """authenticate with the session cookie (if there is one) and fall
+    back to basic auth if the server rejects the cookie (ie. because the
+    session expired). The server sends a new session cookie for a request
+    with basic auth which is then used for the following requests"""
+
+    def __init__(self, user, password):
+        self.user = user
+        self.password = password
+
+    def __call__(self, r):
+        if 'Cookie' in r.headers:
+            r.register_hook('response', self._handle_401)
+        else:
+            r.headers['Authorization'] = _basic_auth_str(self.user,
+                                                         self.password)
+        return r
+
+    def _handle_401(self, r, **kwargs):
+        """send the request again with basic auth if the cookie was not
+        accepted"""
+        if r.status_code != 401:
+            return r
+        LOG.debug("session cookie not accepted. using basic auth")
+        # consume the content so the connection can be reused
+        r.content
+        r.close()
+        prep = r.request.copy()
+        extract_cookies_to_jar(prep._cookies, r.request, r.raw)
+        prep.prepare_cookies(prep._cookies)
+        prep.headers['Authorization'] = _basic_auth_str(self.user,
+                                                        self.password)
+        _r = r.connection.send(prep, **kwargs)
+        _r.history.append(r)
+        _r.request = prep
+        return _r
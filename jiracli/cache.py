@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+
+def cache_dir_get(url, user):
+    """get the cache directory for the given server url and user"""
+    base = os.environ.get('XDG_CACHE_HOME') or \
+        os.path.expanduser('~/.cache')
+    name = hashlib.sha1(
+        ("%s\0%s" % (url, user)).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(base, 'jiracli', name)
+
+
+class Cache(object):
+    """a key/value store (saved as json file) with a time to live for
+    every entry"""
+
+    def __init__(self, path, ttl):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._dirty = False
+        try:
+            with open(path) as f:
+                self._data = json.load(f)
+        except (IOError, OSError, ValueError):
+            self._data = {}
+
+    def get(self, key):
+        """get the value for key or None if not available or expired"""
+        with self._lock:
+            entry = self._data.get(key)
+        if entry is None or time.time() - entry['time'] > self.ttl:
+            return None
+        return entry['value']
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = {'time': time.time(), 'value': value}
+            self._dirty = True
+
+    def save(self):
+        """write the cache file if something changed"""
+        with self._lock:
+            if not self._dirty:
+                return
+            dirname = os.path.dirname(self.path)
+            if not os.path.isdir(dirname):
+                os.makedirs(dirname, 0o700)
+            # write to a tempfile (created with 0600) and rename it so
+            # parallel jiracli runs never read a half written file
+            fd, tmp = tempfile.mkstemp(dir=dirname)
+            with os.fdopen(fd, 'w') as f:
+                json.dump(self._data, f)
+            os.rename(tmp, self.path)
+            self._dirty = False
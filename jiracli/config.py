@@ -16,6 +16,7 @@
 #
 
 import getpass
+import json
 import os
 
 from six.moves import configparser
@@ -54,5 +55,31 @@ def config_get(config_path):
     # some optional configuration options
     if not conf.has_option(section_name, "verify"):
         conf.set(section_name, "verify", "true")
+    if not conf.has_option(section_name, "cache_ttl"):
+        conf.set(section_name, "cache_ttl", "86400")
+    if not conf.has_option(section_name, "session_cache"):
+        conf.set(section_name, "session_cache", "false")
+    if not conf.has_option(section_name, "http_cache_size"):
+        conf.set(section_name, "http_cache_size", "50")
+    if not conf.has_option(section_name, "max_retries"):
+        conf.set(section_name, "max_retries", "5")
 
     return conf
+
+
+def session_cookies_load(session_path):
+    """get the stored session cookies (a list of dicts)"""
+    try:
+        with open(session_path) as f:
+            return json.load(f)
+    except (IOError, OSError, ValueError):
+        return []
+
+
+def session_cookies_save(session_path, cookies):
+    """store the session cookies (a list of dicts). The file contains
+    credentials so it is only readable for the user"""
+    with os.fdopen(os.open(session_path,
+                           os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600),
+                   'w') as f:
+        json.dump(cookies, f)
@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""run jiracli commands in a long running process
+
+The daemon listens on a per-user unix socket. A client sends a single
+json line with the parsed command line arguments and the working
+directory. The daemon answers with json lines, each containing either
+"stdout" or "stderr" output or (as last line) the "exit" code."""
+
+import json
+import logging
+import os
+import sys
+import traceback
+
+
+LOG = logging.getLogger('jiracli')
+
+
+def daemon_socket_path():
+    """get the path of the unix socket for the current user"""
+    base = os.environ.get('XDG_RUNTIME_DIR')
+    if not base:
+        cache_home = os.environ.get('XDG_CACHE_HOME') or \
+            os.path.expanduser('~/.cache')
+        base = os.path.join(cache_home, 'jiracli')
+    return os.path.join(base, 'jiracli-%s.sock' % os.getuid())
+
+
+def _connect(path):
+    """get a socket connected to path or None if nobody listens"""
+    import socket
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except socket.error:
+        sock.close()
+        return None
+    return sock
+
+
+def _send(f, frame):
+    f.write((json.dumps(frame) + "\n").encode('utf-8'))
+    f.flush()
+
+
+class _FrameWriter(object):
+    """a file like object which sends everything written to it as
+    frames for the given stream ('stdout' or 'stderr')"""
+
+    def __init__(self, f, stream, tty=False):
+        self._f = f
+        self._stream = stream
+        self._tty = tty
+
+    def isatty(self):
+        # the output for a terminal is not buffered (see BufferedWriter).
+        # The colors do not depend on it: termcolor checks the file
+        # descriptor, so the client sends its tty flag with the arguments
+        # (see palette_get())
+        return self._tty
+
+    def write(self, text):
+        if text:
+            _send(self._f, {self._stream: text})
+
+    def flush(self):
+        pass
+
+
+def daemon_forward(path, args, stdout=None, stderr=None):
+    """execute a command (the parsed arguments) in a running daemon and
+    write its output to stdout and stderr. Returns the exit code or None
+    if no daemon is running"""
+    stdout = stdout or sys.stdout
+    stderr = stderr or sys.stderr
+    if not os.path.exists(path):
+        return None
+    sock = _connect(path)
+    if sock is None:
+        return None
+    with sock, sock.makefile('rwb') as f:
+        _send(f, {'args': args, 'cwd': os.getcwd(),
+                  'tty': hasattr(stdout, 'isatty') and stdout.isatty()})
+        for line in f:
+            frame = json.loads(line.decode('utf-8'))
+            if 'stdout' in frame:
+                stdout.write(frame['stdout'])
+            elif 'stderr' in frame:
+                stderr.write(frame['stderr'])
+            elif 'exit' in frame:
+                stdout.flush()
+                return frame['exit']
+    LOG.error("connection to the daemon closed unexpectedly")
+    return 1
+
+
+def _serve_one(conn, run):
+    """execute a single command received via conn"""
+    with conn.makefile('rwb') as f:
+        request = json.loads(f.readline().decode('utf-8'))
+        stdout = _FrameWriter(f, 'stdout', request.get('tty', False))
+        stderr = _FrameWriter(f, 'stderr')
+        handler = logging.StreamHandler(stderr)
+        handler.setFormatter(logging.Formatter('%(levelname)s - %(message)s'))
+        handlers = LOG.handlers
+        cwd = os.getcwd()
+        stdout_orig, stderr_orig = sys.stdout, sys.stderr
+        sys.stdout, sys.stderr = stdout, stderr
+        LOG.handlers = [handler]
+        exit_code = 0
+        try:
+            os.chdir(request['cwd'])
+            exit_code = run(request['args'])
+        except SystemExit as e:
+            exit_code = e.code
+        except Exception:
+            stderr.write(traceback.format_exc())
+            exit_code = 1
+        finally:
+            sys.stdout, sys.stderr = stdout_orig, stderr_orig
+            LOG.handlers = handlers
+            os.chdir(cwd)
+        if exit_code is None:
+            exit_code = 0
+        elif not isinstance(exit_code, int):
+            # sys.exit("message")
+            stderr.write("%s\n" % exit_code)
+            exit_code = 1
+        _send(f, {'exit': exit_code})
+
+
+def daemon_serve(path, run, max_requests=None):
+    """execute the commands received on the unix socket path
+
+    run is called with the parsed arguments of every command and the
+    commands are executed one after the other. Serves until interrupted
+    or until max_requests commands were executed. Returns False if
+    another daemon is already running"""
+    import socket
+    dirname = os.path.dirname(path)
+    if not os.path.isdir(dirname):
+        os.makedirs(dirname, 0o700)
+    if os.path.exists(path):
+        sock = _connect(path)
+        if sock is not None:
+            sock.close()
+            LOG.error("a daemon is already listening on '%s'", path)
+            return False
+        # left over from a daemon which was killed
+        os.unlink(path)
+
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    # the socket must only be usable by the current user
+    umask = os.umask(0o077)
+    try:
+        server.bind(path)
+    finally:
+        os.umask(umask)
+    server.listen(8)
+    LOG.debug("daemon listening on '%s'", path)
+    served = 0
+    try:
+        while max_requests is None or served < max_requests:
+            conn, _ = server.accept()
+            with conn:
+                try:
+                    _serve_one(conn, run)
+                except (socket.error, ValueError) as e:
+                    LOG.debug("daemon request failed: %s", e)
+            served += 1
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        os.unlink(path)
+    return True
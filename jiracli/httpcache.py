@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""a disk cache for GET responses which is revalidated with conditional
+requests
+
+Responses with an ETag or Last-Modified header are stored. The next GET
+for the same url sends If-None-Match/If-Modified-Since and a "304 Not
+Modified" answer is replaced by the stored response."""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+from requests.adapters import HTTPAdapter
+
+
+class CachingAdapter(HTTPAdapter):
+    """a transport adapter with a size bounded (least recently used
+    entries are evicted) conditional request cache in the directory
+    path"""
+
+    def __init__(self, path, max_size, **kwargs):
+        super(CachingAdapter, self).__init__(**kwargs)
+        self.path = path
+        self.max_size = max_size
+        self.requests = 0
+        self.hits = 0
+        self.bytes_saved = 0
+        self._lock = threading.Lock()
+        self._dirty = False
+        try:
+            with open(os.path.join(path, 'index.json')) as f:
+                self._index = json.load(f)
+        except (IOError, OSError, ValueError):
+            self._index = {}
+
+    def _body_path(self, key):
+        return os.path.join(self.path, key)
+
+    def _cached(self, key):
+        """get the index entry and the body for key or (None, None)"""
+        with self._lock:
+            entry = self._index.get(key)
+        if entry is None:
+            return None, None
+        try:
+            with open(self._body_path(key), 'rb') as f:
+                return entry, f.read()
+        except (IOError, OSError):
+            with self._lock:
+                self._index.pop(key, None)
+            return None, None
+
+    def _store(self, key, url, response):
+        entry = {
+            'url': url,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'content_type': response.headers.get('Content-Type'),
+            'size': len(response.content),
+            'used': time.time(),
+        }
+        with self._lock:
+            if not os.path.isdir(self.path):
+                os.makedirs(self.path, 0o700)
+            fd, tmp = tempfile.mkstemp(dir=self.path)
+            with os.fdopen(fd, 'wb') as f:
+                f.write(response.content)
+            os.rename(tmp, self._body_path(key))
+            self._index[key] = entry
+            self._dirty = True
+            self._evict()
+
+    def _evict(self):
+        """remove the least recently used entries until the cache is
+        smaller than max_size (the lock must be held)"""
+        size = sum(e['size'] for e in self._index.values())
+        for key in sorted(self._index, key=lambda k: self._index[k]['used']):
+            if size <= self.max_size:
+                break
+            size -= self._index.pop(key)['size']
+            try:
+                os.unlink(self._body_path(key))
+            except OSError:
+                pass
+
+    def send(self, request, stream=False, **kwargs):
+        # streamed responses (ie. downloads) are never cached
+        if request.method != 'GET' or stream:
+            return super(CachingAdapter, self).send(request, stream=stream,
+                                                    **kwargs)
+        key = hashlib.sha1(request.url.encode('utf-8')).hexdigest()
+        entry, body = self._cached(key)
+        if entry is not None:
+            if entry['etag']:
+                request.headers['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                request.headers['If-Modified-Since'] = entry['last_modified']
+        response = super(CachingAdapter, self).send(request, stream=stream,
+                                                    **kwargs)
+        with self._lock:
+            self.requests += 1
+        if response.status_code == 304 and entry is not None:
+            # read the (empty) body so the connection is released
+            response.content
+            response.status_code = 200
+            response.reason = 'OK'
+            response._content = body
+            response.from_cache = True
+            if entry['content_type']:
+                response.headers['Content-Type'] = entry['content_type']
+            with self._lock:
+                self.hits += 1
+                self.bytes_saved += len(body)
+                entry['used'] = time.time()
+                self._dirty = True
+        elif response.status_code == 200 and any(
+                h in response.headers for h in ('ETag', 'Last-Modified')):
+            self._store(key, request.url, response)
+        return response
+
+    def save(self):
+        """write the index if something changed"""
+        with self._lock:
+            if not self._dirty:
+                return
+            if not os.path.isdir(self.path):
+                os.makedirs(self.path, 0o700)
+            fd, tmp = tempfile.mkstemp(dir=self.path)
+            with os.fdopen(fd, 'w') as f:
+                json.dump(self._index, f)
+            os.rename(tmp, os.path.join(self.path, 'index.json'))
+            self._dirty = False
+
+    def stats(self):
+        """get a line with the hit rate and the saved bytes"""
+        rate = 100.0 * self.hits / self.requests if self.requests else 0.0
+        return "http cache: %d of %d GET requests not modified " \
+            "(%.0f%%), %d bytes saved" % (self.hits, self.requests, rate,
+                                          self.bytes_saved)
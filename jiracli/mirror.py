@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""a local sqlite mirror of the issues of some projects
+
+The raw json of every issue is stored together with the columns which
+can be used in the supported JQL subset (see mirror_search())."""
+
+import datetime
+import json
+import logging
+import os
+import re
+import sqlite3
+
+
+LOG = logging.getLogger('jiracli')
+
+# JQL field name -> column
+COLUMNS = {
+    'project': 'project',
+    'key': 'key',
+    'issuekey': 'key',
+    'status': 'status',
+    'issuetype': 'issuetype',
+    'type': 'issuetype',
+    'priority': 'priority',
+    'assignee': 'assignee',
+    'reporter': 'reporter',
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS issues (
+    key TEXT PRIMARY KEY COLLATE NOCASE,
+    project TEXT COLLATE NOCASE,
+    number INTEGER,
+    issuetype TEXT COLLATE NOCASE,
+    status TEXT COLLATE NOCASE,
+    priority TEXT COLLATE NOCASE,
+    assignee TEXT COLLATE NOCASE,
+    reporter TEXT COLLATE NOCASE,
+    updated TEXT,
+    open_sprint INTEGER NOT NULL DEFAULT 0,
+    raw TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS issues_project ON issues (project, number);
+CREATE TABLE IF NOT EXISTS sync (
+    project TEXT PRIMARY KEY,
+    updated TEXT
+);
+"""
+
+
+def mirror_open(path):
+    """open (and create if needed) the mirror database"""
+    dirname = os.path.dirname(path)
+    if not os.path.isdir(dirname):
+        os.makedirs(dirname, 0o700)
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _name(raw_fields, field):
+    value = raw_fields.get(field)
+    return value.get('name') if value else None
+
+
+def mirror_store(conn, raw):
+    """store (or update) the raw json of an issue"""
+    fields = raw['fields']
+    project, number = raw['key'].rsplit('-', 1)
+    conn.execute(
+        "INSERT OR REPLACE INTO issues (key, project, number, issuetype, "
+        "status, priority, assignee, reporter, updated, open_sprint, raw) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, COALESCE("
+        "(SELECT open_sprint FROM issues WHERE key = ?), 0), ?)",
+        (raw['key'], project, int(number), _name(fields, 'issuetype'),
+         _name(fields, 'status'), _name(fields, 'priority'),
+         _name(fields, 'assignee'), _name(fields, 'reporter'),
+         fields.get('updated'), raw['key'], json.dumps(raw)))
+
+
+def _jql_date(updated):
+    """get a JQL date ("yyyy/MM/dd HH:mm") for a jira timestamp
+    (ie. '2013-11-07T16:13:24.000+0100')"""
+    return datetime.datetime.strptime(
+        updated[:16], "%Y-%m-%dT%H:%M").strftime("%Y/%m/%d %H:%M")
+
+
+def mirror_sync(conn, jira_obj, project, search_iter, page_size=50):
+    """update the mirror for the given project
+
+    The first sync gets all issues of the project, the next ones only the
+    issues which were updated since the latest update in the mirror.
+    search_iter is used to iterate over the search results (see
+    jiracli.issue_search_iter()). Returns the number of updated issues"""
+    row = conn.execute("SELECT updated FROM sync WHERE project = ?",
+                       (project,)).fetchone()
+    project_jql = 'project = "%s"' % project
+    jql = project_jql
+    if row is not None and row[0]:
+        # updated has a resolution of minutes so some issues are fetched
+        # again. That's fine because the issues are replaced
+        jql += ' AND updated >= "%s"' % _jql_date(row[0])
+    count = 0
+    latest = row[0] if row is not None else None
+    for issue in search_iter(jira_obj, jql + ' ORDER BY updated ASC',
+                             page_size=page_size, fields='*all'):
+        mirror_store(conn, issue.raw)
+        updated = issue.raw['fields'].get('updated')
+        if updated and (latest is None or updated > latest):
+            latest = updated
+        count += 1
+
+    # the issues in open sprints (only the keys are needed)
+    try:
+        open_sprint = [
+            i.key for i in search_iter(
+                jira_obj, project_jql + ' AND sprint IN openSprints()',
+                page_size=page_size, fields='key')]
+    except Exception as e:
+        # ie. the server has no agile support
+        LOG.debug("can not get issues in open sprints: %s", e)
+    else:
+        conn.execute("UPDATE issues SET open_sprint = 0 WHERE project = ?",
+                     (project,))
+        conn.executemany("UPDATE issues SET open_sprint = 1 WHERE key = ?",
+                         [(k,) for k in open_sprint])
+
+    conn.execute("INSERT OR REPLACE INTO sync (project, updated) "
+                 "VALUES (?, ?)", (project, latest))
+    conn.commit()
+    return count
+
+
+def mirror_issues_get(conn, keys):
+    """get the raw json for the given issue keys (None if an issue is not
+    available in the mirror)"""
+    issues = []
+    for key in keys:
+        row = conn.execute("SELECT raw FROM issues WHERE key = ?",
+                           (key.upper(),)).fetchone()
+        issues.append(json.loads(row[0]) if row else None)
+    return issues
+
+
+def mirror_sprint(conn, project):
+    """get the raw json for the issues in open sprints of the project"""
+    return [json.loads(row[0]) for row in conn.execute(
+        "SELECT raw FROM issues WHERE project = ? AND open_sprint = 1 "
+        "ORDER BY number", (project,))]
+
+
+_VALUE = r'("[^"]*"|\'[^\']*\'|currentUser\(\)|[^\s()]+)'
+_CLAUSE = re.compile(
+    r'^\s*(\w+)\s*(?:'
+    r'(?P<op>!=|=)\s*' + _VALUE + r'|'
+    r'(?P<in>not\s+in|in)\s*\((?P<list>[^)]*)\)|'
+    r'(?P<is>is\s+not|is)\s+(?:empty|null)'
+    r')\s*$', re.I)
+
+
+def _unquote(value, user):
+    value = value.strip()
+    if value[:1] in ('"', "'"):
+        value = value[1:-1]
+    if value.lower() == 'currentuser()':
+        value = user
+    return value
+
+
+def mirror_query(jql, user=None):
+    """translate a JQL subset into a sql query (with parameters)
+
+    Supported are clauses combined with AND, each in the form
+    'field = value', 'field != value', 'field in (values)',
+    'field not in (values)', 'field is EMPTY' or 'field is not EMPTY'
+    for the fields in COLUMNS and an optional 'ORDER BY field [ASC|DESC]'.
+    Raises ValueError for unsupported queries"""
+    order = "project, number"
+    m = re.search(r'\s*\border\s+by\s+(\w+)(?:\s+(asc|desc))?\s*$', jql,
+                  re.I)
+    if m:
+        field = m.group(1).lower()
+        if field == 'key':
+            column = 'project %s, number' % (m.group(2) or '')
+        elif field in COLUMNS or field == 'updated':
+            column = COLUMNS.get(field, field)
+        else:
+            raise ValueError("can not order by '%s'" % m.group(1))
+        order = "%s %s" % (column, m.group(2) or '')
+        jql = jql[:m.start()]
+
+    where = []
+    params = []
+    for clause in re.split(r'\s+and\s+', jql.strip(), flags=re.I):
+        if not clause:
+            continue
+        m = _CLAUSE.match(clause)
+        if m is None or m.group(1).lower() not in COLUMNS:
+            raise ValueError("unsupported JQL for --offline: '%s'" % clause)
+        column = COLUMNS[m.group(1).lower()]
+        if m.group('op'):
+            where.append("%s %s ?" % (column, m.group('op')))
+            params.append(_unquote(m.group(3), user))
+        elif m.group('in'):
+            values = [_unquote(v, user)
+                      for v in m.group('list').split(',') if v.strip()]
+            negate = 'NOT ' if m.group('in').lower().startswith('not') \
+                else ''
+            where.append("%s %sIN (%s)" % (column, negate,
+                                           ", ".join("?" * len(values))))
+            params.extend(values)
+        else:
+            negate = 'NOT ' if m.group('is').lower() != 'is' else ''
+            where.append("%s IS %sNULL" % (column, negate))
+    sql = "SELECT raw FROM issues"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY " + order.strip()
+    return sql, params
+
+
+def mirror_search(conn, jql, user=None, limit=None):
+    """get the raw json for the issues matching the JQL (see
+    mirror_query() for the supported subset)"""
+    sql, params = mirror_query(jql, user)
+    if limit is not None:
+        sql += " LIMIT %d" % limit
+    for row in conn.execute(sql, params):
+        yield json.loads(row[0])
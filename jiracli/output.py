@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""machine readable output (see --format)"""
+
+import csv
+import json
+import sys
+
+
+FORMATS = ('jsonl', 'csv', 'tsv')
+
+
+class BufferedWriter(object):
+    """collect the text written to a stream and write it in chunks of
+    buffer_size characters. A stream which is a tty gets every write
+    immediately"""
+
+    def __init__(self, stream=None, buffer_size=65536):
+        self._stream = stream or sys.stdout
+        self._buffer_size = buffer_size
+        if getattr(self._stream, 'isatty', lambda: False)():
+            self._buffer_size = 0
+        self._chunks = []
+        self._size = 0
+
+    def write(self, text):
+        self._chunks.append(text)
+        self._size += len(text)
+        if self._size >= self._buffer_size:
+            self.flush()
+
+    def flush(self):
+        if self._chunks:
+            self._stream.write("".join(self._chunks))
+            self._chunks = []
+            self._size = 0
+        self._stream.flush()
+
+
+class RecordWriter(BufferedWriter):
+    """write records (dicts) as json lines, csv or tsv to a stream
+
+    For csv and tsv the columns are written as header, missing values are
+    empty and other keys are ignored."""
+
+    def __init__(self, fmt, columns, stream=None, buffer_size=65536):
+        super(RecordWriter, self).__init__(stream, buffer_size)
+        self._csv = None
+        if fmt in ('csv', 'tsv'):
+            self._csv = csv.DictWriter(
+                self, columns, restval='', extrasaction='ignore',
+                delimiter=',' if fmt == 'csv' else '\t',
+                lineterminator='\n')
+            self._csv.writeheader()
+
+    def record(self, record):
+        if self._csv is None:
+            self.write(json.dumps(record) + "\n")
+        else:
+            self._csv.writerow(record)
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""retries and adaptive concurrency for rate limited servers
+
+The RetryAdapter retries throttled requests (429, for every method
+because the server did not process them) and failed idempotent requests
+(502, 503, 504 and connection errors). A 503 may come from a proxy after
+the server processed the request, so a POST is not sent again. It waits
+as long as the Retry-After header says or uses an exponential backoff
+with jitter. The number of parallel requests is limited by an AIMD
+controller: every successful request increases the limit a bit, a
+throttled request (or a 503) halves it."""
+
+import email.utils
+import logging
+import random
+import threading
+import time
+
+from requests.adapters import BaseAdapter
+from requests.exceptions import ConnectionError
+
+
+LOG = logging.getLogger('jiracli')
+
+# status code for requests which were not processed by the server
+THROTTLED = (429,)
+# status codes for requests which failed (maybe after being processed)
+FAILED = (502, 503, 504)
+# methods which can be sent again if the result is unknown
+IDEMPOTENT = ('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE')
+
+
+class AIMDLimiter(object):
+    """limit the number of parallel requests to a limit which is
+    additively increased (up to max_limit) for every successful request and
+    multiplicatively decreased for every throttled request.
+
+    A burst of parallel requests is usually throttled together, so the
+    limit is only decreased for requests which were sent after the last
+    decrease. Entering the limiter returns the window of the request which
+    must be given to feedback()."""
+
+    def __init__(self, max_limit):
+        self.max_limit = max_limit
+        self.limit = float(max_limit)
+        self.throttled = 0
+        self._window = 0
+        self._active = 0
+        self._cond = threading.Condition()
+
+    def max_limit_set(self, max_limit):
+        """change the maximum (ie. to the --jobs of another command). The
+        limit follows the maximum unless requests were throttled"""
+        with self._cond:
+            if self.limit >= self.max_limit:
+                self.limit = float(max_limit)
+            else:
+                self.limit = min(self.limit, float(max_limit))
+            self.max_limit = max_limit
+            self._cond.notify_all()
+
+    def __enter__(self):
+        with self._cond:
+            while self._active >= int(self.limit):
+                self._cond.wait()
+            self._active += 1
+            return self._window
+
+    def __exit__(self, *exc_info):
+        with self._cond:
+            self._active -= 1
+            self._cond.notify_all()
+
+    def feedback(self, throttled, window):
+        """adapt the limit to the result of a request"""
+        with self._cond:
+            if not throttled:
+                self.limit = min(self.max_limit,
+                                 self.limit + 1.0 / self.limit)
+                self._cond.notify_all()
+                return
+            self.throttled += 1
+            if window == self._window:
+                self._window += 1
+                self.limit = max(1.0, self.limit / 2)
+                LOG.debug("server throttles requests, %d parallel "
+                          "requests now", int(self.limit))
+
+
+def retry_after_get(response):
+    """get the seconds to wait from the Retry-After header (seconds or a
+    http date) or None"""
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    date = email.utils.parsedate_tz(value)
+    if date is None:
+        return None
+    return max(0.0, email.utils.mktime_tz(date) - time.time())
+
+
+def retry_delay(attempt, response=None, backoff=0.5, max_delay=60.0):
+    """get the seconds to wait before the next attempt (Retry-After of
+    the response or an exponential backoff with jitter)"""
+    delay = retry_after_get(response) if response is not None else None
+    if delay is None:
+        delay = backoff * 2 ** attempt * random.uniform(0.5, 1.5)
+    return min(max_delay, delay)
+
+
+class RetryAdapter(BaseAdapter):
+    """a transport adapter which sends the requests with the given adapter
+    (limited by the limiter) and retries them (see module docstring)"""
+
+    def __init__(self, adapter, limiter, max_retries=5, backoff=0.5,
+                 max_delay=60.0):
+        super(RetryAdapter, self).__init__()
+        self.adapter = adapter
+        self.limiter = limiter
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_delay = max_delay
+
+    def _delay(self, attempt, response=None):
+        return retry_delay(attempt, response, self.backoff, self.max_delay)
+
+    def send(self, request, **kwargs):
+        idempotent = request.method in IDEMPOTENT
+        for attempt in range(self.max_retries + 1):
+            last = attempt == self.max_retries
+            try:
+                with self.limiter as window:
+                    response = self.adapter.send(request, **kwargs)
+            except ConnectionError as e:
+                if not idempotent or last:
+                    raise
+                delay = self._delay(attempt)
+                LOG.debug("%s %s failed (%s), retry in %.1f s",
+                          request.method, request.url, e, delay)
+                time.sleep(delay)
+                continue
+            throttled = response.status_code in THROTTLED
+            self.limiter.feedback(
+                throttled or response.status_code == 503, window)
+            if last or not (throttled or (
+                    idempotent and response.status_code in FAILED)):
+                return response
+            delay = self._delay(attempt, response)
+            LOG.debug("%s %s: %s, retry in %.1f s", request.method,
+                      request.url, response.status_code, delay)
+            # read the body so the connection can be reused
+            response.content
+            response.close()
+            time.sleep(delay)
+
+    def close(self):
+        self.adapter.close()
@@ -0,0 +1,494 @@
+# -*- coding: utf-8 -*-
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""a local stand-in for the JIRA REST API
+
+The server only implements the parts of the REST API jiracli uses and
+is used by the tests and the benchmarks. It can simulate a network
+latency and counts the requests and transferred bytes."""
+
+from collections import OrderedDict
+import hashlib
+import json
+import re
+import threading
+import time
+import uuid
+
+from six.moves import BaseHTTPServer
+from six.moves import configparser
+from six.moves import socketserver
+from six.moves.urllib.parse import parse_qs, quote, urlparse
+
+
+API = '/rest/api/2/'
+DATE = '2013-11-07T16:13:24.000+0100'
+
+
+def issue_raw(project, number):
+    """get the raw json for a generated issue"""
+    key = '%s-%s' % (project, number)
+    return {
+        'id': str(number),
+        'key': key,
+        'fields': {
+            'project': {'key': project},
+            'summary': 'summary of %s' % key,
+            'description': 'description of %s' % key,
+            'issuetype': {'name': 'Bug'},
+            'status': {'name': 'Open'},
+            'priority': {'name': 'Major'},
+            'created': DATE,
+            'updated': DATE,
+            'reporter': {'name': 'reporter'},
+            'assignee': {'name': 'assignee'},
+            'components': [{'name': 'component'}],
+            'labels': ['label'],
+            'fixVersions': [],
+            'versions': [],
+            'attachment': [],
+            'issuelinks': [],
+            'comment': {'comments': [], 'startAt': 0, 'maxResults': 0,
+                        'total': 0},
+        },
+    }
+
+
+def comment_raw(number, body, date=DATE):
+    """get the raw json for a comment"""
+    return {'id': str(number), 'body': body, 'author': {'name': 'user'},
+            'updateAuthor': {'name': 'user'}, 'created': date,
+            'updated': date}
+
+
+FIELDS = [
+    {'id': name, 'name': name, 'clauseNames': [name]}
+    for name in ('summary', 'description', 'status', 'assignee')
+]
+
+
+TRANSITIONS = [
+    {'id': '4', 'name': 'Start Progress', 'to': {'name': 'In Progress'}},
+    {'id': '5', 'name': 'Resolve Issue', 'to': {'name': 'Resolved'}},
+    {'id': '2', 'name': 'Close Issue', 'to': {'name': 'Closed'}},
+]
+
+
+class FakeJira(object):
+    """a fake JIRA server with a generated dataset"""
+
+    def __init__(self, issues=100, projects=('TEST',), latency=0.0,
+                 max_concurrent=0, max_results=1000):
+        self.latency = latency
+        # the maximum number of issues per search result page
+        self.max_results = max_results
+        # answer "429 Too Many Requests" if more requests are in progress
+        self.max_concurrent = max_concurrent
+        self.active = 0
+        self.throttled = 0
+        self.projects = projects
+        self.issues = OrderedDict()
+        for project in projects:
+            for number in range(1, issues + 1):
+                raw = issue_raw(project, number)
+                self.issues[raw['key']] = raw
+        # keys of the issues in open sprints
+        self.sprint = set()
+        # jql per filter id
+        self.filters = {}
+        # content per attachment id
+        self.attachments = {}
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.bytes_sent = 0
+        # number of "304 Not Modified" answers
+        self.not_modified = 0
+        # number of requests authenticated with basic auth
+        self.basic_auths = 0
+        # valid session cookies
+        self.sessions = set()
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self):
+        return 'http://%s:%s' % self._server.server_address[:2]
+
+    def start(self):
+        self._server = _Server(('127.0.0.1', 0), _Handler)
+        self._server.jira = self
+        self._thread = threading.Thread(target=self._server.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def conf(self):
+        """get a jiracli configuration for this server"""
+        conf = configparser.RawConfigParser()
+        conf.add_section('defaults')
+        conf.set('defaults', 'user', 'user')
+        conf.set('defaults', 'password', 'secret')
+        conf.set('defaults', 'url', self.url)
+        conf.set('defaults', 'verify', 'true')
+        conf.set('defaults', 'cache_ttl', '86400')
+        conf.set('defaults', 'session_cache', 'false')
+        conf.set('defaults', 'http_cache_size', '0')
+        conf.set('defaults', 'max_retries', '5')
+        return conf
+
+    def attachment_add(self, key, filename, content):
+        """add an attachment (bytes) to an issue"""
+        with self.lock:
+            attachment_id = str(len(self.attachments) + 1)
+            self.attachments[attachment_id] = content
+        self.issues[key]['fields']['attachment'].append({
+            'id': attachment_id, 'filename': filename, 'size': len(content),
+            'content': '%s/secure/attachment/%s/%s' % (
+                self.url, attachment_id, quote(filename, safe=''))})
+
+    def stats_reset(self):
+        with self.lock:
+            self.requests = 0
+            self.bytes_sent = 0
+            self.not_modified = 0
+
+    def search(self, jql):
+        """evaluate a (very) small subset of JQL"""
+        issues = list(self.issues.values())
+        m = re.search(r'project\s*=\s*"?(\w+)"?', jql, re.I)
+        if m:
+            issues = [i for i in issues
+                      if i['fields']['project']['key'] == m.group(1)]
+        m = re.search(r'key\s+in\s*\(([^)]*)\)', jql, re.I)
+        if m:
+            keys = [k.strip().strip('"') for k in m.group(1).split(',')]
+            issues = [i for i in issues if i['key'] in keys]
+        m = re.search(r'updated\s*>=\s*"([^"]+)"', jql, re.I)
+        if m:
+            # "yyyy/MM/dd HH:mm" compared with the first 16 characters
+            since = m.group(1).replace('/', '-').replace(' ', 'T')
+            issues = [i for i in issues
+                      if i['fields']['updated'][:16] >= since]
+        if re.search(r'sprint\s+in\s+openSprints\(\)', jql, re.I):
+            issues = [i for i in issues if i['key'] in self.sprint]
+        for clause, field in (('status', 'status'),
+                              ('priority', 'priority'),
+                              ('component', 'components'),
+                              ('assignee', 'assignee')):
+            m = re.search(r'\b%s\s*=\s*"((?:[^"\\]|\\.)*)"' % clause, jql,
+                          re.I)
+            if m:
+                value = re.sub(r'\\(.)', r'\1', m.group(1))
+                issues = [i for i in issues if value in _names(i, field)]
+            if re.search(r'\b%s\s+is\s+EMPTY' % clause, jql, re.I):
+                issues = [i for i in issues if not _names(i, field)]
+        return issues
+
+    def bulk_create(self, issue_updates):
+        """create issues (the summary must be shorter than 255 characters
+        and the parent must exist)"""
+        created = []
+        errors = []
+        for n, update in enumerate(issue_updates):
+            fields = update['fields']
+            error = None
+            if len(fields['summary']) > 255:
+                error = {'summary': 'Summary must be less than 255 '
+                         'characters.'}
+            elif 'parent' in fields and \
+                    fields['parent']['key'] not in self.issues:
+                error = {'parent': 'Could not find issue by id or key.'}
+            if error is not None:
+                errors.append({'status': 400, 'failedElementNumber': n,
+                               'elementErrors': {'errorMessages': [],
+                                                 'errors': error}})
+                continue
+            project = fields['project']['key']
+            with self.lock:
+                number = 1 + sum(1 for k in self.issues
+                                 if k.startswith(project + '-'))
+                raw = issue_raw(project, number)
+                raw['fields'].update(fields)
+                self.issues[raw['key']] = raw
+            created.append({'id': raw['id'], 'key': raw['key'],
+                            'self': self.url + API + 'issue/' + raw['id']})
+        return 201 if created else 400, {'issues': created, 'errors': errors}
+
+    def handle(self, method, path, params, body):
+        """get the (status, json) for a request"""
+        m = re.match(r'/rest/api/(2|latest)/', path)
+        if m is None:
+            return 404, {}
+        path = path[m.end():]
+        if path == 'serverInfo':
+            return 200, {'versionNumbers': [8, 0, 0],
+                         'deploymentType': 'Server'}
+        if path == 'field':
+            return 200, FIELDS
+        if path == 'project':
+            return 200, [{'id': str(n), 'key': p, 'name': 'project %s' % p}
+                         for n, p in enumerate(self.projects)]
+        m = re.match(r'project/(\w+)/components$', path)
+        if m:
+            return 200, [{'id': '1', 'name': 'component'}]
+        m = re.match(r'project/(\w+)/statuses$', path)
+        if m:
+            # the statuses of the workflow of the project
+            return 200, [{'id': '1', 'name': 'Bug', 'statuses': [
+                {'id': '0', 'name': 'Open'}, {'id': '2', 'name': 'Closed'}]}]
+        if path == 'user/assignable/search':
+            # the assignees of the issues of the project and a user
+            # without issues
+            names = set(['user'])
+            names.update(n for i in self.search(
+                'project = %s' % params.get('project', ''))
+                for n in _names(i, 'assignee'))
+            start_at = int(params.get('startAt', 0))
+            max_results = int(params.get('maxResults', 50))
+            return 200, [{'name': name, 'key': name} for name in sorted(
+                names)[start_at:start_at + max_results]]
+        if path == 'status':
+            return 200, [{'id': str(n), 'name': name} for n, name in
+                         enumerate(('Open', 'In Progress', 'Closed'))]
+        if path == 'priority':
+            return 200, [{'id': str(n), 'name': name} for n, name in
+                         enumerate(('Major', 'Minor'))]
+        if path == 'issuetype':
+            return 200, [{'id': '1', 'name': 'Bug', 'description': 'a bug'},
+                         {'id': '2', 'name': 'Sub-task', 'subtask': True,
+                          'description': 'a subtask'}]
+        if path == 'issueLinkType':
+            return 200, {'issueLinkTypes': [
+                {'id': '1', 'name': 'Blocks', 'inward': 'is blocked by',
+                 'outward': 'blocks'}]}
+        if path == 'filter/favourite':
+            return 200, [{'id': '1', 'name': 'my filter',
+                          'jql': 'project = TEST', 'owner': {'name': 'user'},
+                          'viewUrl': self.url + '/filter/1'}]
+        m = re.match(r'filter/(\d+)$', path)
+        if m:
+            if m.group(1) not in self.filters:
+                return 404, {'errorMessages': ['filter does not exist'],
+                             'errors': {}}
+            return 200, {'id': m.group(1), 'name': 'filter %s' % m.group(1),
+                         'jql': self.filters[m.group(1)]}
+        if path == 'user/search':
+            name = params.get('username')
+            return 200, [{'self': self.url + API + 'user?username=' + name,
+                          'name': name, 'key': name}]
+        if path == 'search':
+            issues = self.search(params.get('jql', ''))
+            start_at = int(params.get('startAt', 0))
+            max_results = min(int(params.get('maxResults', 50)),
+                              self.max_results)
+            page = [_issue_view(i, params)
+                    for i in issues[start_at:start_at + max_results]]
+            return 200, {'startAt': start_at, 'maxResults': max_results,
+                         'total': len(issues), 'issues': page}
+        if path == 'issue/bulk' and method == 'POST':
+            return self.bulk_create(body['issueUpdates'])
+        if path == 'issue' and method == 'POST':
+            status, result = self.bulk_create([body])
+            if result['issues']:
+                return 201, result['issues'][0]
+            return 400, result['errors'][0]['elementErrors']
+        m = re.match(r'issue/([^/]+)(/.*)?$', path)
+        if m:
+            issue = self.issues.get(m.group(1))
+            if issue is None:
+                return 404, {'errorMessages': ['Issue Does Not Exist'],
+                             'errors': {}}
+            if m.group(2) is None and method == 'GET':
+                return 200, _issue_view(issue, params)
+            if m.group(2) is None and method == 'PUT':
+                with self.lock:
+                    _issue_update(issue, body.get('update', {}))
+                return 204, None
+            if m.group(2) == '/transitions':
+                if method == 'GET':
+                    return 200, {'transitions': TRANSITIONS}
+                return 204, None
+            if m.group(2) in ('/assignee', '/watchers'):
+                return 204, None
+            if m.group(2) == '/comment':
+                comments = issue['fields']['comment']
+                if method == 'POST':
+                    with self.lock:
+                        comment = comment_raw(
+                            len(comments['comments']) + 1, body['body'])
+                        comments['comments'].append(comment)
+                        comments['total'] = comments['maxResults'] = \
+                            len(comments['comments'])
+                    return 201, comment
+                start_at = int(params.get('startAt', 0))
+                max_results = int(params.get('maxResults', 50))
+                ordered = sorted(comments['comments'],
+                                 key=lambda c: c['created'],
+                                 reverse=params.get('orderBy') == '-created')
+                return 200, {
+                    'startAt': start_at, 'maxResults': max_results,
+                    'total': len(ordered),
+                    'comments': ordered[start_at:start_at + max_results]}
+        return 404, {}
+
+
+def _names(issue, field):
+    """get the names of the value(s) of a field"""
+    value = issue['fields'].get(field)
+    if isinstance(value, list):
+        return [v['name'] for v in value]
+    return [value['name']] if value else []
+
+
+def _issue_update(issue, update):
+    """apply the add/remove operations to the list fields of an issue"""
+    for field, operations in update.items():
+        values = issue['fields'][field]
+        for operation in operations:
+            for op, value in operation.items():
+                if op == 'add' and value not in values:
+                    values.append(value)
+                elif op == 'remove' and value in values:
+                    values.remove(value)
+
+
+def _issue_view(issue, params):
+    """get an issue with the requested fields and expansions"""
+    fields = params.get('fields', '*all').split(',')
+    raw = dict(issue)
+    if '*all' not in fields and '*navigable' not in fields:
+        raw['fields'] = dict((k, v) for k, v in issue['fields'].items()
+                             if k in fields)
+    if 'transitions' in params.get('expand', '').split(','):
+        raw['transitions'] = TRANSITIONS
+    return raw
+
+
+class _Server(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+
+class _Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def _request(self):
+        jira = self.server.jira
+        url = urlparse(self.path)
+        # repeated parameters (ie. fields) are joined
+        params = dict((k, ",".join(v))
+                      for k, v in parse_qs(url.query).items())
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        if body:
+            body = json.loads(body.decode('utf-8'))
+        with jira.lock:
+            jira.active += 1
+            throttled = jira.max_concurrent and \
+                jira.active > jira.max_concurrent
+        try:
+            if throttled:
+                self._throttle()
+            else:
+                self._respond(url, params, body)
+        finally:
+            with jira.lock:
+                jira.active -= 1
+
+    def _throttle(self):
+        jira = self.server.jira
+        payload = json.dumps({'errorMessages': ['rate limit exceeded'],
+                              'errors': {}}).encode('utf-8')
+        with jira.lock:
+            jira.requests += 1
+            jira.throttled += 1
+        self.send_response(429)
+        self.send_header('Retry-After', '0')
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _respond(self, url, params, body):
+        jira = self.server.jira
+        if jira.latency:
+            time.sleep(jira.latency)
+        m = re.match(r'/secure/attachment/(\d+)/', url.path)
+        if m:
+            return self._attachment(m.group(1))
+        session = None
+        m = re.search(r'JSESSIONID=(\w+)', self.headers.get('Cookie', ''))
+        if self.headers.get('Authorization', '').startswith('Basic '):
+            with jira.lock:
+                jira.basic_auths += 1
+                session = uuid.uuid4().hex
+                jira.sessions.add(session)
+            status, data = jira.handle(self.command, url.path, params, body)
+        elif m and m.group(1) in jira.sessions:
+            status, data = jira.handle(self.command, url.path, params, body)
+        else:
+            status, data = 401, {'errorMessages': ['unauthorized'],
+                                 'errors': {}}
+        payload = b'' if data is None else json.dumps(data).encode('utf-8')
+        etag = None
+        if self.command == 'GET' and status == 200:
+            etag = '"%s"' % hashlib.md5(payload).hexdigest()
+            if self.headers.get('If-None-Match') == etag:
+                status, payload = 304, b''
+        with jira.lock:
+            jira.requests += 1
+            jira.bytes_sent += len(payload)
+            if status == 304:
+                jira.not_modified += 1
+        self.send_response(status)
+        if etag is not None:
+            self.send_header('ETag', etag)
+        if session is not None:
+            self.send_header('Set-Cookie', 'JSESSIONID=%s; Path=/' % session)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _attachment(self, attachment_id):
+        """send the content of an attachment (or the requested range)"""
+        jira = self.server.jira
+        content = jira.attachments.get(attachment_id)
+        status = 200 if content is not None else 404
+        payload = content or b''
+        m = re.match(r'bytes=(\d+)-$', self.headers.get('Range', ''))
+        if content is not None and m:
+            start = int(m.group(1))
+            status, payload = 206, content[start:]
+        with jira.lock:
+            jira.requests += 1
+            jira.bytes_sent += len(payload)
+        self.send_response(status)
+        if status == 206:
+            self.send_header('Content-Range', 'bytes %d-%d/%d' % (
+                start, len(content) - 1, len(content)))
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    do_GET = do_POST = do_PUT = do_DELETE = _request
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import unittest
+import mock
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+import jiracli
+from jiracli.tests.fakejira import FakeJira
+
+
+@unittest.skipIf(aiohttp is None, "aiohttp is not available")
+class AsyncJiraTest(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeJira(issues=5).start()
+        self.client = jiracli.async_client_get(self.server.conf(), 10)
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_requests(self):
+        client = self.client
+
+        async def requests(key):
+            issue = await client.issue(key, fields='summary')
+            search = await client.search('key in (%s)' % key,
+                                         fields='summary')
+            transitions = await client.transitions(key)
+            await client.transition_issue(key, transitions[0]['id'])
+            await client.assign_issue(key, 'user')
+            await client.add_watcher(key, 'user')
+            await client.remove_watcher(key, 'user')
+            comment = await client.add_comment(key, 'a comment')
+            return issue, search, comment
+
+        [(key, result, error)] = client.map(requests, ['TEST-1'])
+        assert error is None
+        issue, search, comment = result
+        assert list(issue['fields']) == ['summary']
+        assert search['total'] == 1
+        assert search['issues'][0]['key'] == 'TEST-1'
+        assert comment['body'] == 'a comment'
+
+    def test_create_issue(self):
+        fields = {'project': {'key': 'TEST'}, 'issuetype': {'name': 'Bug'},
+                  'summary': 'new issue'}
+        [(_, created, error)] = self.client.map(
+            self.client.create_issue, [fields])
+        assert error is None
+        assert created['key'] == 'TEST-6'
+        assert self.server.issues['TEST-6']['fields']['summary'] == \
+            'new issue'
+
+    def test_map_error(self):
+        results = self.client.map(self.client.issue, ['TEST-1', 'TEST-99'])
+        assert [r[0] for r in results] == ['TEST-1', 'TEST-99']
+        assert results[0][1]['key'] == 'TEST-1'
+        error = results[1][2]
+        assert error.status_code == 404
+        assert jiracli.error_text(error) == 'Issue Does Not Exist'
+
+    def test_map_concurrency(self):
+        server = FakeJira(issues=50, latency=0.02, max_concurrent=8).start()
+        try:
+            client = jiracli.async_client_get(server.conf(), 8)
+            keys = ['TEST-%s' % i for i in range(1, 51)]
+            results = client.map(client.issue, keys)
+            assert [r[1]['key'] for r in results] == keys
+            # the server never had more than 8 requests at once
+            assert server.throttled == 0
+        finally:
+            server.stop()
+
+    @mock.patch('jiracli.print', create=True)
+    def test_issues_transition(self, mock_print):
+        jira_obj = jiracli.jira_obj_get(self.server.conf())
+        self.server.stats_reset()
+        issues = ['TEST-%s' % i for i in range(1, 6)]
+        assert jiracli.issues_transition(jira_obj, issues, 'closed',
+                                         client=self.client)
+        # field list, search and (without a cache) the transitions and a
+        # transition per issue
+        assert self.server.requests == 2 + 2 * len(issues)
+        with mock.patch.object(jiracli.LOG, 'error'):
+            assert not jiracli.issues_transition(
+                jira_obj, ['TEST-99'], 'closed', client=self.client)
@@ -16,10 +16,32 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 
+import datetime
+import json
+import os
+import shutil
+import stat
+import subprocess
+import sys
+import tempfile
 import unittest
+import mock
+import six
 
 from ddt import ddt, data, unpack
 import jiracli
+from jiracli.cache import Cache
+from jiracli.trace import HttpTrace
+from jiracli.tests.fakejira import FakeJira, comment_raw, issue_raw
+
+
+def _result_list(keys, total):
+    """get a search result page with issues for the given keys"""
+    issues = mock.MagicMock()
+    issues.__iter__.return_value = [mock.Mock(key=k) for k in keys]
+    issues.__len__.return_value = len(keys)
+    issues.total = total
+    return issues
 
 
 @ddt
@@ -35,3 +57,754 @@ class BaseTest(unittest.TestCase):
     @unpack
     def test_issue_status_color(self, status, expected_color):
         assert jiracli.issue_status_color(status) == expected_color
+
+    @mock.patch('jiracli.issue_list_print')
+    def test_issue_search_result_print_single_request(self, mock_print):
+        jira_obj = mock.Mock()
+        jira_obj.search_issues.return_value = _result_list(['X-1'], 1)
+        args = {'issue_desc': False, 'issue_comments': True,
+                'issue_trans': True, 'issue_oneline': False,
+                'limit': None, 'page_size': 50, 'fields': None,
+                'format': 'text', 'no_color': False,
+                'comments_last': None, 'comments_since': None,
+                'tty': False}
+        jiracli.issue_search_result_print(jira_obj, args, ['project = X'])
+        # the issues are printed while they are fetched
+        assert [i.key for i in mock_print.call_args[0][1]] == ['X-1']
+        jira_obj.search_issues.assert_called_once_with(
+            'project = X', startAt=0, maxResults=50,
+            fields=jiracli.issue_fields_get(), expand='transitions')
+        # the issues must not be fetched again
+        assert not jira_obj.issue.called
+
+    @data(
+        (None, ','.join(jiracli.ISSUE_FIELDS)),
+        ('summary, customfield_1,', 'project,issuetype,status,summary,'
+         'priority,customfield_1'),
+        ('*all', 'project,issuetype,status,summary,priority,*all'),
+    )
+    @unpack
+    def test_issue_fields_get(self, fields, expected):
+        assert jiracli.issue_fields_get(fields) == expected
+
+    def test_issue_fields_get_without_comments(self):
+        assert 'comment' not in jiracli.issue_fields_get(
+            comments=False).split(',')
+        assert jiracli.issue_fields_get('comment', comments=False) == \
+            ','.join(jiracli.ISSUE_REQUIRED_FIELDS)
+
+    def test_issue_format_sliced_comments(self):
+        raw = issue_raw('TEST', 1)
+        raw['fields']['comment'] = {
+            'comments': [comment_raw(1, 'the last comment')], 'total': 7}
+        issue = jiracli.issue_from_raw(raw)
+        palette = jiracli.palette_get(False)
+        assert jiracli.issue_format(None, issue)['comments'] == '7'
+        comments = jiracli.issue_format(None, issue, show_comments=True,
+                                        palette=palette)['comments']
+        assert comments.startswith('7 (1 shown)\n')
+        assert comments.endswith('the last comment')
+
+    @data('2020-01-02', '2020-01-02 10:30')
+    def test_date_parse(self, value):
+        date = jiracli.date_parse(value)
+        assert date.tzinfo is not None
+        assert (date.year, date.month, date.day) == (2020, 1, 2)
+
+    def test_date_parse_invalid(self):
+        with self.assertRaises(ValueError):
+            jiracli.date_parse('yesterday')
+
+    @data('2013-11-07T16:13:24.000+0100', '1999-01-31T00:00:59.123-0700')
+    def test_dtstr2dt(self, dtstr):
+        expected = datetime.datetime.strptime(
+            dtstr[:-9], "%Y-%m-%dT%H:%M:%S").strftime("%c")
+        assert jiracli.dtstr2dt(dtstr) == expected
+
+    def test_palette_get_disabled(self):
+        assert not any(jiracli.palette_get(False).values())
+
+    def test_issue_header(self):
+        raw = issue_raw('TEST', 1)
+        raw['fields']['priority'] = None
+        issue = jiracli.issue_from_raw(raw)
+        palette = jiracli.palette_get(False)
+        palette.update(header='<h>', red='<r>', reset='</>')
+        assert jiracli.issue_header(issue, palette) == \
+            '<h>TEST-1, Bug: summary of TEST-1</> (<r>Open, n/a</>)'
+
+    @data(
+        (True, True, True),
+        (True, False, False),
+        (False, True, False),
+    )
+    @unpack
+    def test_palette_get(self, enabled, tty, colored):
+        with mock.patch.dict(os.environ, clear=True):
+            palette = jiracli.palette_get(enabled, tty)
+        assert bool(palette['header']) == colored
+        assert bool(palette['reset']) == colored
+        if colored:
+            assert palette['red'] == '\033[31m\033[1m'
+
+    def test_palette_get_stdout(self):
+        # the output is not colorized if stdout is not a terminal (and the
+        # tty flag is not given)
+        with mock.patch('sys.stdout', six.StringIO()):
+            assert not jiracli.palette_get()['header']
+
+    def test_issue_export_record(self):
+        raw = issue_raw('TEST', 1)
+        raw['fields']['comment'] = {
+            'comments': [comment_raw(1, 'the last comment')], 'total': 7}
+        record = jiracli.issue_export_record(jiracli.issue_from_raw(raw))
+        assert list(record) == list(jiracli.ISSUE_RECORD_COLUMNS)
+        # the values of the server, not the text output
+        assert record['created'] == raw['fields']['created']
+        assert record['updated'] == raw['fields']['updated']
+        assert record['reporter'] == 'reporter'
+        assert record['assignee'] == 'assignee'
+        assert record['comments'] == 7
+
+    @data(
+        ('project = TEST AND status = Open', ['TEST']),
+        ('PROJECT in (A, "B") ORDER BY key', ['A', 'B']),
+        ('assignee = currentUser()', []),
+    )
+    @unpack
+    def test_jql_projects(self, searchstr, expected):
+        assert jiracli.jql_projects(searchstr) == expected
+
+    def test_jql_quote(self):
+        assert jiracli.jql_quote('a "b" \\') == '"a \\"b\\" \\\\"'
+
+    @data(
+        ('assignee', [('a', 2), (None, 1)], ['a', '(none)', '(other)']),
+        ('status', [('Open', 4)], ['Open']),
+        # an issue can have several components
+        ('component', [('a', 2)], ['a']),
+    )
+    @unpack
+    def test_issue_count_print(self, field, counts, expected):
+        with mock.patch('sys.stdout', six.StringIO()) as stdout:
+            jiracli.issue_count_print(4, counts, field)
+        rows = [line.split()[0] for line in
+                stdout.getvalue().splitlines()[2:]]
+        assert rows == expected + ['total']
+        if '(other)' in expected:
+            assert stdout.getvalue().splitlines()[-2].split() == \
+                ['(other)', '1']
+
+    @data('component', 'assignee')
+    def test_issue_count_get_without_project(self, field):
+        with self.assertRaises(ValueError):
+            jiracli.group_values_get(mock.Mock(), None, field,
+                                     'assignee = currentUser()')
+
+    @data(
+        # limit, page_size, total, expected number of requests
+        (None, 2, 5, 3),
+        (None, 5, 5, 1),
+        (3, 2, 5, 2),
+        (0, 2, 5, 0),
+    )
+    @unpack
+    def test_issue_search_iter(self, limit, page_size, total, requests):
+        keys = ['X-%s' % i for i in range(total)]
+        jira_obj = mock.Mock()
+        jira_obj.search_issues.side_effect = \
+            lambda jql, startAt, maxResults: _result_list(
+                keys[startAt:startAt + maxResults], total)
+        issues = list(jiracli.issue_search_iter(
+            jira_obj, 'project = X', limit=limit, page_size=page_size))
+        assert [i.key for i in issues] == keys[:limit]
+        assert jira_obj.search_issues.call_count == requests
+
+    def test_issues_file_parse(self):
+        tmpdir = tempfile.mkdtemp(prefix='jiracli-tmp_')
+        path = os.path.join(tmpdir, 'issues.txt')
+        try:
+            with open(path, 'w') as f:
+                f.write("task 1\n\n * sub 1\n- sub 2\ntask 2\n")
+            assert list(jiracli.issues_file_parse(path)) == [
+                (1, 'task 1', False), (3, 'sub 1', True),
+                (4, 'sub 2', True), (5, 'task 2', False)]
+        finally:
+            shutil.rmtree(tmpdir)
+
+    @data(1, 3)
+    def test_parallel_map(self, jobs):
+        def func(item):
+            if item == 2:
+                raise ValueError('failed')
+            return item * 10
+        results = list(jiracli.parallel_map(func, [1, 2, 3, 4], jobs=jobs))
+        assert [(i, r) for i, r, e in results] == \
+            [(1, 10), (2, None), (3, 30), (4, 40)]
+        assert [i for i, r, e in results if e is not None] == [2]
+
+    @data(['--limit', '-1'], ['--page-size', '0'], ['--comments-last', '-1'])
+    def test_parse_args_invalid_number(self, argv):
+        with mock.patch('sys.argv', ['jiracli'] + argv), \
+                mock.patch('sys.stderr', six.StringIO()):
+            with self.assertRaises(SystemExit):
+                jiracli.parse_args()
+
+    def test_parse_args_limit(self):
+        with mock.patch('sys.argv', ['jiracli', '--limit', '0']):
+            assert jiracli.parse_args()['limit'] == 0
+
+    def test_parallel_map_streams(self):
+        consumed = []
+
+        def items():
+            for i in range(100):
+                consumed.append(i)
+                yield i
+        results = jiracli.parallel_map(lambda i: i, items(), jobs=2)
+        assert next(results)[0] == 0
+        # the items are not consumed at once
+        assert len(consumed) <= 4
+        assert [r[0] for r in results] == list(range(1, 100))
+
+    @mock.patch('jiracli.print', create=True)
+    def test_bulk_execute_partial_failure(self, mock_print):
+        func = mock.Mock(side_effect=[None, ValueError('failed'), None])
+        ok = jiracli.bulk_execute(func, ['X-1', 'X-2', 'X-3'], jobs=1,
+                                  action='moved')
+        assert ok is False
+        assert func.call_count == 3
+        # only the successful issues are reported on stdout
+        assert [c[0][0].split()[0] for c in mock_print.call_args_list] == \
+            ['X-1', 'X-3']
+
+    @data(
+        ('resolved', '5'),
+        ('closed', '2'),
+        ('open', None),
+    )
+    @unpack
+    def test_issue_transition_find(self, action, expected):
+        transitions = [
+            {'id': '5', 'name': 'Resolve Issue', 'to': 'Resolved'},
+            {'id': '2', 'name': 'Done', 'to': 'Closed'},
+        ]
+        assert jiracli.issue_transition_find(
+            transitions, jiracli.TRANSITION_NAMES[action]) == expected
+
+    def test_metadata_get_cached(self):
+        tmpdir = tempfile.mkdtemp(prefix='jiracli-tmp_')
+        try:
+            path = os.path.join(tmpdir, 'metadata.json')
+            func = mock.Mock(return_value=[mock.Mock(raw={'name': 'Bug'})])
+            cache = Cache(path, 60)
+            assert jiracli.metadata_get(cache, 'issue_types', func) == \
+                [{'name': 'Bug'}]
+            cache.save()
+            # served from the cache file
+            assert jiracli.metadata_get(Cache(path, 60), 'issue_types',
+                                        func) == [{'name': 'Bug'}]
+            assert func.call_count == 1
+            # --refresh
+            jiracli.metadata_get(Cache(path, 0), 'issue_types', func)
+            assert func.call_count == 2
+        finally:
+            shutil.rmtree(tmpdir)
+
+    @data(
+        (['bug'], True),
+        (['Bug', 'Task'], False),
+    )
+    @unpack
+    def test_metadata_names_check(self, names, expected):
+        metadata = [{'name': 'Bug'}, {'name': 'Story'}]
+        assert jiracli.metadata_names_check(metadata, names,
+                                            'issue type') is expected
+
+    def test_import_no_heavy_modules(self):
+        """importing jiracli (ie. for --help) must not import the modules
+        which are only needed to talk to the server, for the output, the
+        mirror or the daemon"""
+        code = ('import sys, jiracli; print(" ".join(sorted(set(['
+                '"jira", "requests", "tabulate", "termcolor", "sqlite3", '
+                '"socket", "jiracli.mirror", "jiracli.daemon"]) & '
+                'set(sys.modules))))')
+        out = subprocess.check_output([sys.executable, '-c', code])
+        assert out.strip() == b''
+
+    def test_lazy_jira(self):
+        factory = mock.Mock()
+        jira_obj = jiracli.LazyJIRA(factory)
+        assert not factory.called
+        jira_obj.issue('X-1')
+        jira_obj.issue('X-2')
+        assert factory.call_count == 1
+        assert factory.return_value.issue.call_count == 2
+
+    @data(
+        ({}, True),
+        ({'debug': True}, False),
+        ({'trace_http': True}, False),
+        ({'issue_create': ['P', 'Bug', 's', '', '']}, False),
+        ({'issue_create': ['P', 'Bug', 's', '', ''], 'description': 'd'},
+         True),
+        ({'issue_comment_add': ['P-1']}, False),
+        ({'issue_comment_add': ['P-1'], 'message': ['m']}, True),
+    )
+    @unpack
+    def test_daemon_forwardable(self, args, expected):
+        defaults = {'debug': False, 'no_verify': False, 'refresh': False,
+                    'issue_create': None, 'description': None,
+                    'issue_comment_add': None, 'message': None,
+                    'trace_http': False, 'profile': False}
+        defaults.update(args)
+        assert jiracli.daemon_forwardable(defaults) is expected
+
+
+@ddt
+class FakeJiraTest(unittest.TestCase):
+    """tests which talk to a FakeJira (see server_start())"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp(prefix='jiracli-tmp_')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def server_start(self, **kwargs):
+        """start a FakeJira which is stopped after the test"""
+        server = FakeJira(**kwargs).start()
+        self.addCleanup(server.stop)
+        return server
+
+    @data(
+        # last, since (day of month), expected comments, requests
+        (3, None, [8, 9, 10], 2),
+        (0, None, [], 1),
+        (None, 6, [6, 7, 8, 9, 10], 3),
+        (2, 6, [9, 10], 1),
+        (None, None, list(range(1, 11)), 5),
+    )
+    @unpack
+    def test_issue_comments_get(self, last, since, expected, requests):
+        server = self.server_start(issues=1)
+        server.issues['TEST-1']['fields']['comment']['comments'] = [
+            comment_raw(n, 'comment %s' % n,
+                        date='2020-01-%02dT10:00:00.000+0000' % n)
+            for n in range(1, 11)]
+        jira_obj = jiracli.jira_obj_get(server.conf())
+        server.stats_reset()
+        if since is not None:
+            since = datetime.datetime(2020, 1, since,
+                                      tzinfo=datetime.timezone.utc)
+        total, comments = jiracli.issue_comments_get(
+            jira_obj, 'TEST-1', last=last, since=since, page_size=2)
+        assert total == 10
+        assert [int(c['id']) for c in comments] == expected
+        assert server.requests == requests
+
+    @data(
+        # --comments-last, comments with the search, comment requests
+        (None, True, 0),
+        (0, False, 3),
+    )
+    @unpack
+    def test_issue_search_result_print_comments_count(
+            self, last, with_search, requests):
+        server = self.server_start(issues=3)
+        server.issues['TEST-2']['fields']['comment']['comments'] = [
+            comment_raw(n, 'comment %s' % n) for n in range(1, 4)]
+        server.issues['TEST-2']['fields']['comment']['total'] = 3
+        jira_obj = jiracli.jira_obj_get(server.conf())
+        args = {'issue_desc': False, 'issue_comments': False,
+                'issue_trans': False, 'issue_oneline': False,
+                'limit': None, 'page_size': 50, 'fields': None,
+                'format': 'text', 'no_color': True, 'jobs': 2,
+                'comments_last': last, 'comments_since': None,
+                'tty': False}
+        search = mock.patch.object(jira_obj, 'search_issues',
+                                   wraps=jira_obj.search_issues)
+        get_json = mock.patch.object(jira_obj, '_get_json',
+                                     wraps=jira_obj._get_json)
+        with search as mock_search, get_json as mock_get_json, \
+                mock.patch('sys.stdout', six.StringIO()) as stdout:
+            jiracli.issue_search_result_print(jira_obj, args,
+                                              ['project = TEST'])
+        # by default the comments are requested with the search, there
+        # are no requests per issue
+        assert ('comment' in mock_search.call_args[1]['fields'].split(
+            ',')) is with_search
+        counts = [c[1]['params'] for c in mock_get_json.call_args_list
+                  if c[0][0].endswith('/comment')]
+        assert len(counts) == requests
+        assert all(p['maxResults'] == 0 for p in counts)
+        assert stdout.getvalue().count('comments') == 1
+        assert 'comments             : 3' in stdout.getvalue()
+
+    def test_issue_format_projected_fields(self):
+        server = self.server_start(issues=1)
+        jira_obj = jiracli.jira_obj_get(server.conf())
+        issue = next(jiracli.issue_search_iter(
+            jira_obj, 'project = TEST',
+            fields=jiracli.issue_fields_get('summary')))
+        assert 'comment' not in issue.raw['fields']
+        # issue_format() works with a subset of the fields
+        assert jiracli.issue_format(jira_obj, issue,
+                                    show_comments=True) == \
+            {'comments': '0'}
+
+    @mock.patch('jiracli.color_codes')
+    def test_issue_list_print_format(self, mock_color_codes):
+        server = self.server_start(issues=2)
+        jira_obj = jiracli.jira_obj_get(server.conf())
+        issues = jiracli.issue_search_iter(jira_obj, 'project = TEST')
+        with mock.patch('sys.stdout') as mock_stdout:
+            jiracli.issue_list_print(jira_obj, issues, False, False,
+                                     False, False, fmt='csv')
+        lines = "".join(c[0][0] for c in
+                        mock_stdout.write.call_args_list).splitlines()
+        assert lines[0] == ",".join(jiracli.ISSUE_RECORD_COLUMNS)
+        assert lines[1].startswith('TEST-1,Bug,Open,Major,summary of')
+        assert len(lines) == 3
+        assert not mock_color_codes.called
+
+    def test_issues_search_multi(self):
+        server = self.server_start(issues=5)
+        trace = HttpTrace()
+        jira_obj = jiracli.jira_obj_get(server.conf(), trace=trace)
+        issues, matches = jiracli.issues_search_multi(
+            jira_obj, ['key in (TEST-1, TEST-2, TEST-3)',
+                       'key in (TEST-4, TEST-3)'], jobs=2,
+            fields='summary')
+        # a search per search string and a single one for the issues
+        assert len([r for r in trace.records
+                    if r[1].endswith('/search')]) == 3
+        assert list(issues) == ['TEST-1', 'TEST-2', 'TEST-3', 'TEST-4']
+        assert issues['TEST-4'].fields.summary == 'summary of TEST-4'
+        assert matches == [['TEST-1', 'TEST-2', 'TEST-3'],
+                           ['TEST-3', 'TEST-4']]
+
+    def test_issues_search_multi_page_limit(self):
+        # the server returns at most 2 issues per page
+        server = self.server_start(issues=5, max_results=2)
+        jira_obj = jiracli.jira_obj_get(server.conf())
+        issues, matches = jiracli.issues_search_multi(
+            jira_obj, ['project = TEST', 'key in (TEST-5)'], jobs=2,
+            page_size=4, fields='summary')
+        keys = ['TEST-%s' % n for n in range(1, 6)]
+        assert list(issues) == keys
+        assert matches == [keys, ['TEST-5']]
+
+    @data(
+        ('merge', 'text', ['TEST-1, Bug: summary of TEST-1 (Open, Major)',
+                           'TEST-2, Bug: summary of TEST-2 (Open, Major)']),
+        ('tag', 'text', [
+            'TEST-1, Bug: summary of TEST-1 (Open, Major) [filter 1]',
+            'TEST-2, Bug: summary of TEST-2 (Open, Major) '
+            '[filter 1 | filter 2]']),
+        ('sections', 'text', [
+            'filter 1 : 2 issues', '',
+            'TEST-1, Bug: summary of TEST-1 (Open, Major)',
+            'TEST-2, Bug: summary of TEST-2 (Open, Major)',
+            'filter 2 : 1 issues', '',
+            'TEST-2, Bug: summary of TEST-2 (Open, Major)']),
+        ('sections', 'tsv', ['TEST-1\tfilter 1',
+                             'TEST-2\tfilter 1 | filter 2']),
+    )
+    @unpack
+    def test_issue_search_result_print_modes(self, mode, fmt, expected):
+        server = self.server_start(issues=3)
+        jira_obj = jiracli.jira_obj_get(server.conf())
+        args = {'issue_desc': False, 'issue_comments': False,
+                'issue_trans': False, 'issue_oneline': True,
+                'limit': None, 'page_size': 50, 'fields': None,
+                'format': fmt, 'no_color': True, 'jobs': 2,
+                'search_mode': mode, 'comments_last': None,
+                'comments_since': None, 'tty': False}
+        with mock.patch('sys.stdout', six.StringIO()) as stdout:
+            jiracli.issue_search_result_print(
+                jira_obj, args, ['key in (TEST-1, TEST-2)',
+                                 'key in (TEST-2)'],
+                names=['filter 1', 'filter 2'])
+        lines = stdout.getvalue().splitlines()
+        if fmt == 'tsv':
+            assert lines[0].endswith('\tqueries')
+            lines = ["%s\t%s" % (line.split('\t')[0], line.split('\t')[-1])
+                     for line in lines[1:]]
+        assert lines == expected
+
+    @data(
+        (None, []),
+        ('status', [('Open', 3), ('Closed', 1)]),
+        ('priority', [('Major', 4)]),
+        ('component', [('component', 3), (None, 1)]),
+        ('assignee', [('assignee', 2), (None, 1), ('other', 1)]),
+    )
+    @unpack
+    def test_issue_count_get(self, field, expected):
+        server = self.server_start(issues=4)
+        fields = server.issues['TEST-2']['fields']
+        fields['status'] = {'name': 'Closed'}
+        fields['components'] = []
+        server.issues['TEST-3']['fields']['assignee'] = None
+        server.issues['TEST-4']['fields']['assignee'] = {'name': 'other'}
+        cache = Cache(os.path.join(self.tmpdir, 'metadata.json'), 60)
+        jira_obj = jiracli.jira_obj_get(server.conf())
+        server.stats_reset()
+        total, counts = jiracli.issue_count_get(
+            jira_obj, cache, 'project = TEST ORDER BY key', field=field,
+            jobs=4)
+        assert total == 4
+        assert sorted(counts, key=lambda c: (-c[1], c[0] or '')) == \
+            sorted(expected, key=lambda c: (-c[1], c[0] or ''))
+        # only the totals (and the values) are transferred
+        assert server.bytes_sent < 1000
+
+    def test_issue_count_get_too_many_values(self):
+        server = self.server_start(issues=1)
+        cache = Cache(os.path.join(self.tmpdir, 'metadata.json'), 60)
+        jira_obj = jiracli.jira_obj_get(server.conf())
+        with self.assertRaises(ValueError):
+            jiracli.issue_count_get(jira_obj, cache, 'project = TEST',
+                                    field='status', max_values=1)
+
+    @data(
+        ('project = TEST', 'status', ['Open', 'Closed']),
+        ('priority = Major', 'status', ['Open', 'In Progress', 'Closed']),
+        ('project = TEST', 'assignee', ['assignee', 'other', 'user']),
+    )
+    @unpack
+    def test_group_values_get(self, searchstr, field, expected):
+        server = self.server_start(issues=3)
+        server.issues['TEST-3']['fields']['assignee'] = {'name': 'other'}
+        cache = Cache(os.path.join(self.tmpdir, 'metadata.json'), 60)
+        jira_obj = jiracli.jira_obj_get(server.conf())
+        assert jiracli.group_values_get(jira_obj, cache, field,
+                                        searchstr) == expected
+        # the values are cached
+        server.stats_reset()
+        jiracli.group_values_get(jira_obj, cache, field, searchstr)
+        assert server.requests == 0
+
+    def test_assignable_users_get(self):
+        server = self.server_start(issues=3)
+        server.issues['TEST-3']['fields']['assignee'] = {'name': 'other'}
+        jira_obj = jiracli.jira_obj_get(server.conf())
+        users = jiracli.assignable_users_get(jira_obj, 'TEST',
+                                             page_size=2)
+        assert [u['name'] for u in users] == ['assignee', 'other', 'user']
+
+    @data(1, 4)
+    def test_issue_export(self, jobs):
+        server = self.server_start(issues=120)
+        path = os.path.join(self.tmpdir, 'export.jsonl')
+        jira_obj = jiracli.jira_obj_get(server.conf(), jobs=jobs)
+        server.stats_reset()
+        count = jiracli.issue_export(jira_obj, 'project = TEST', path,
+                                     jobs=jobs, page_size=50)
+        assert count == 120
+        # the field list (used by search_issues()) and 3 pages
+        assert server.requests == 4
+        with open(path) as f:
+            records = [json.loads(line) for line in f]
+        assert [r['key'] for r in records] == \
+            ['TEST-%s' % i for i in range(1, 121)]
+        assert records[0]['summary'] == 'summary of TEST-1'
+        assert records[0]['components'] == 'component'
+
+    def test_issue_export_fields(self):
+        server = self.server_start(issues=2)
+        path = os.path.join(self.tmpdir, 'export.jsonl')
+        jira_obj = jiracli.jira_obj_get(server.conf())
+        # only the summary (and the required fields) are requested
+        assert jiracli.issue_export(jira_obj, 'project = TEST', path,
+                                    fields='summary') == 2
+        with open(path) as f:
+            record = json.loads(f.readline())
+        assert record['summary'] == 'summary of TEST-1'
+        assert record['description'] == ''
+
+    @data('jsonl', 'csv', 'text')
+    def test_issue_list_print_fields(self, fmt):
+        server = self.server_start(issues=1)
+        jira_obj = jiracli.jira_obj_get(server.conf())
+        issues = jiracli.issue_search_iter(
+            jira_obj, 'project = TEST',
+            fields=jiracli.issue_fields_get('summary'))
+        with mock.patch('sys.stdout', six.StringIO()) as stdout:
+            jiracli.issue_list_print(jira_obj, issues, True, False,
+                                     False, False, fmt=fmt, color=False)
+        assert 'summary of TEST-1' in stdout.getvalue()
+        assert 'None' not in stdout.getvalue()
+
+    def test_issues_create(self):
+        server = self.server_start(issues=0)
+        jira_obj = jiracli.jira_obj_get(server.conf())
+        lines = [(1, 'sub 0', True)]
+        for n in range(2, 122, 2):
+            lines.append((n, 'task %s' % n, False))
+            lines.append((n + 1, 'sub %s' % n, True))
+        # the issue on line 4 and the subtask on line 9 fail
+        lines[3] = (4, 'x' * 300, False)
+        lines[8] = (9, 'y' * 300, True)
+        server.stats_reset()
+        results = jiracli.issues_create(jira_obj, 'TEST', 'Task',
+                                        'Sub-task', lines,
+                                        chunk_size=50)
+        # 2 chunks for the issues and 2 for the subtasks
+        assert server.requests == 4
+        assert len(results) == len(lines)
+        assert results[0] == (1, 'sub 0', None, 'no parent issue')
+        assert results[1] == (2, 'task 2', 'TEST-1', None)
+        assert results[2] == (3, 'sub 2', 'TEST-60', None)
+        assert results[3][2:] == (
+            None, 'summary: Summary must be less than 255 characters.')
+        assert results[4] == (5, 'sub 4', None,
+                              'parent issue (line 4) was not created')
+        assert results[8][2] is None
+        assert len([r for r in results if r[2] is not None]) == 117
+        assert server.issues['TEST-60']['fields']['parent'] == \
+            {'key': 'TEST-1'}
+
+    @mock.patch('jiracli.print', create=True)
+    def test_issues_transition_cached(self, mock_print):
+        server = self.server_start(issues=10)
+        cache = Cache(os.path.join(self.tmpdir, 'transitions.json'), 60)
+        jira_obj = jiracli.jira_obj_get(server.conf())
+        server.stats_reset()
+        issues = ['TEST-%s' % i for i in range(1, 11)]
+        assert jiracli.issues_transition(jira_obj, issues, 'closed',
+                                         cache=cache, jobs=4)
+        # field list, search, a single transitions request (all issues
+        # have the same workflow state) and the transitions
+        assert server.requests == 3 + len(issues)
+
+    @mock.patch('jiracli.print', create=True)
+    def test_issues_field_edit(self, mock_print):
+        server = self.server_start(issues=3)
+        jira_obj = jiracli.jira_obj_get(server.conf())
+        server.stats_reset()
+        assert jiracli.issues_field_edit(
+            jira_obj, ['TEST-1', 'TEST-2'], 'labels', 'add', ['a', 'b'],
+            jobs=2)
+        assert jiracli.issues_field_edit(
+            jira_obj, ['TEST-1'], 'components', 'remove', ['component'])
+        # a single request per issue and edit
+        assert server.requests == 3
+        assert server.issues['TEST-1']['fields']['labels'] == \
+            ['label', 'a', 'b']
+        assert server.issues['TEST-1']['fields']['components'] == []
+        with mock.patch.object(jiracli.LOG, 'error'):
+            assert not jiracli.issues_field_edit(
+                jira_obj, ['TEST-99'], 'labels', 'add', ['a'])
+
+    @mock.patch('jiracli.print', create=True)
+    def test_issues_field_edit_remove_labels(self, mock_print):
+        server = self.server_start(issues=2)
+        server.issues['TEST-1']['fields']['labels'] = ['Label', 'other']
+        jira_obj = jiracli.jira_obj_get(server.conf())
+        # labels are removed case insensitive (like before the update
+        # operations were used)
+        assert jiracli.issues_field_edit(
+            jira_obj, ['TEST-1', 'TEST-2'], 'labels', 'remove', ['LABEL'])
+        assert server.issues['TEST-1']['fields']['labels'] == ['other']
+        assert server.issues['TEST-2']['fields']['labels'] == []
+
+    def test_attachment_download_resume(self):
+        server = self.server_start(issues=1)
+        content = os.urandom(200000)
+        server.attachment_add('TEST-1', 'log.tar', content)
+        attachment = server.issues['TEST-1']['fields']['attachment'][0]
+        path = os.path.join(self.tmpdir, 'log.tar')
+        # an interrupted download
+        with open(path + '.part', 'wb') as f:
+            f.write(content[:50000])
+        jira_obj = jiracli.jira_obj_get(server.conf())
+        server.stats_reset()
+        assert jiracli.attachment_download(
+            jira_obj, attachment, path, chunk_size=4096) == 150000
+        assert server.bytes_sent == 150000
+        with open(path, 'rb') as f:
+            assert f.read() == content
+        assert not os.path.exists(path + '.part')
+        # a complete file is skipped
+        assert jiracli.attachment_download(jira_obj, attachment,
+                                           path) is None
+        assert server.requests == 1
+
+    @mock.patch('jiracli.print', create=True)
+    def test_issues_attachments_get(self, mock_print):
+        server = self.server_start(issues=2)
+        server.attachment_add('TEST-1', 'a.log', b'a' * 1000)
+        server.attachment_add('TEST-1', '../b.log', b'b' * 10)
+        server.attachment_add('TEST-2', 'a.log', b'c' * 10)
+        jira_obj = jiracli.jira_obj_get(server.conf())
+        assert jiracli.issues_attachments_get(
+            jira_obj, ['TEST-1', 'TEST-2'], self.tmpdir, jobs=3)
+        assert sorted(os.listdir(os.path.join(self.tmpdir, 'TEST-1'))) == \
+            ['a.log', 'b.log']
+        with open(os.path.join(self.tmpdir, 'TEST-2', 'a.log'), 'rb') as f:
+            assert f.read() == b'c' * 10
+        assert mock_print.call_args[0][0].startswith(
+            '3 attachments, 1020 bytes in')
+        with mock.patch.object(jiracli.LOG, 'error'):
+            assert not jiracli.issues_attachments_get(
+                jira_obj, ['TEST-99'], self.tmpdir)
+
+    @mock.patch('jiracli.print', create=True)
+    def test_issues_attachments_get_duplicate_names(self, mock_print):
+        server = self.server_start(issues=1)
+        server.attachment_add('TEST-1', 'log.txt', b'a' * 1000)
+        server.attachment_add('TEST-1', 'log.txt', b'b' * 10)
+        server.attachment_add('TEST-1', 'other.txt', b'c')
+        jira_obj = jiracli.jira_obj_get(server.conf())
+        assert jiracli.issues_attachments_get(
+            jira_obj, ['TEST-1'], self.tmpdir, jobs=3)
+        directory = os.path.join(self.tmpdir, 'TEST-1')
+        assert sorted(os.listdir(directory)) == \
+            ['1_log.txt', '2_log.txt', 'other.txt']
+        with open(os.path.join(directory, '2_log.txt'), 'rb') as f:
+            assert f.read() == b'b' * 10
+        # the next run finds both files
+        assert jiracli.issues_attachments_get(
+            jira_obj, ['TEST-1'], self.tmpdir, jobs=3)
+        assert mock_print.call_args[0][0].startswith(
+            '3 attachments, 0 bytes in')
+
+    def test_jira_obj_get_server_info_cached(self):
+        server = self.server_start(issues=1)
+        cache = Cache(os.path.join(self.tmpdir, 'metadata.json'), 60)
+        jiracli.jira_obj_get(server.conf(), cache=cache)
+        assert server.requests == 1
+        jira_obj = jiracli.jira_obj_get(server.conf(), cache=cache)
+        # no further serverInfo request
+        assert server.requests == 1
+        assert jira_obj.deploymentType == 'Server'
+
+    @mock.patch('jiracli.atexit.register')
+    def test_jira_obj_get_session_cookie(self, mock_register):
+        server = self.server_start(issues=1)
+        session_path = os.path.join(self.tmpdir, 'session')
+        cache = Cache(os.path.join(self.tmpdir, 'metadata.json'), 60)
+        jira_obj = jiracli.jira_obj_get(server.conf(), cache=cache,
+                                        session_path=session_path)
+        jira_obj.issue('TEST-1')
+        # only the first request (the server info) uses basic auth
+        assert server.basic_auths == 1
+        # store the cookies (done at exit)
+        mock_register.call_args[0][0]()
+        assert oct(stat.S_IMODE(os.lstat(session_path).st_mode)) == \
+            oct(0o600)
+
+        # the next run uses the session cookie
+        jira_obj = jiracli.jira_obj_get(server.conf(), cache=cache,
+                                        session_path=session_path)
+        jira_obj.issue('TEST-1')
+        assert server.basic_auths == 1
+
+        # expired session: fall back to basic auth once
+        server.sessions.clear()
+        jira_obj.issue('TEST-1')
+        assert server.basic_auths == 2
+        jira_obj.issue('TEST-1')
+        assert server.basic_auths == 2
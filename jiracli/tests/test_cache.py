@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import unittest
+import mock
+import os
+import shutil
+import stat
+import tempfile
+
+import jiracli.cache
+
+
+class CacheTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp(prefix='jiracli-tmp_')
+        self.path = os.path.join(self.tmpdir, 'sub', 'cache.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_cache_save_and_load(self):
+        cache = jiracli.cache.Cache(self.path, 60)
+        cache.set('key', [1, 2])
+        cache.save()
+        assert oct(stat.S_IMODE(os.lstat(self.path).st_mode)) == oct(0o600)
+        assert jiracli.cache.Cache(self.path, 60).get('key') == [1, 2]
+
+    def test_cache_expired(self):
+        cache = jiracli.cache.Cache(self.path, 60)
+        with mock.patch('time.time', return_value=1000):
+            cache.set('key', 'value')
+        with mock.patch('time.time', return_value=1059):
+            assert cache.get('key') == 'value'
+        with mock.patch('time.time', return_value=1061):
+            assert cache.get('key') is None
+
+    def test_cache_dir_get(self):
+        assert jiracli.cache.cache_dir_get('https://a', 'joe') != \
+            jiracli.cache.cache_dir_get('https://b', 'joe')
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from __future__ import print_function
+
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from ddt import ddt, data, unpack
+from six import StringIO
+import jiracli.daemon
+
+
+def _run(args):
+    """a command for the daemon"""
+    print("issue %s" % args['issue'])
+    if args['fail']:
+        logging.getLogger('jiracli').error("failed")
+        raise SystemExit(2)
+
+
+@ddt
+class DaemonTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp(prefix='jiracli-tmp_')
+        self.path = os.path.join(self.tmpdir, 'jiracli.sock')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_daemon_forward_no_daemon(self):
+        assert jiracli.daemon.daemon_forward(self.path, {}) is None
+
+    @data(
+        (False, "issue X-1\n", "", 0),
+        (True, "issue X-1\n", "ERROR - failed\n", 2),
+    )
+    @unpack
+    def test_daemon_forward(self, fail, stdout, stderr, exit_code):
+        thread = threading.Thread(target=jiracli.daemon.daemon_serve,
+                                  args=(self.path, _run, 1))
+        thread.start()
+        while not os.path.exists(self.path):
+            time.sleep(0.01)
+        out, err = StringIO(), StringIO()
+        assert jiracli.daemon.daemon_forward(
+            self.path, {'issue': 'X-1', 'fail': fail},
+            stdout=out, stderr=err) == exit_code
+        thread.join()
+        assert out.getvalue() == stdout
+        assert err.getvalue() == stderr
+        # the socket is removed when the daemon stops
+        assert not os.path.exists(self.path)
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import unittest
+import mock
+import os
+import shutil
+import tempfile
+
+import jiracli
+from jiracli.tests.fakejira import FakeJira
+
+
+class CachingAdapterTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp(prefix='jiracli-tmp_')
+        self.path = os.path.join(self.tmpdir, 'http')
+        self.server = FakeJira(issues=10).start()
+
+    def tearDown(self):
+        self.server.stop()
+        shutil.rmtree(self.tmpdir)
+
+    def _jira_obj_get(self, max_size=1024 * 1024):
+        with mock.patch('atexit.register'):
+            jira_obj = jiracli.jira_obj_get(self.server.conf(),
+                                            http_cache_path=self.path,
+                                            http_cache_size=max_size)
+        return jira_obj, jira_obj._session.get_adapter(
+            self.server.url).adapter
+
+    def test_not_modified(self):
+        jira_obj, adapter = self._jira_obj_get()
+        summary = jira_obj.issue('TEST-1').fields.summary
+        self.server.stats_reset()
+        assert jira_obj.issue('TEST-1').fields.summary == summary
+        assert self.server.not_modified == 1
+        assert self.server.bytes_sent == 0
+        assert adapter.hits == 1
+        assert adapter.bytes_saved > 0
+
+    def test_modified(self):
+        jira_obj, adapter = self._jira_obj_get()
+        jira_obj.issue('TEST-1')
+        self.server.issues['TEST-1']['fields']['summary'] = 'changed'
+        assert jira_obj.issue('TEST-1').fields.summary == 'changed'
+        assert adapter.hits == 0
+
+    def test_index_saved(self):
+        jira_obj, adapter = self._jira_obj_get()
+        jira_obj.issue('TEST-1')
+        adapter.save()
+        jira_obj, adapter = self._jira_obj_get()
+        self.server.stats_reset()
+        jira_obj.issue('TEST-1')
+        assert self.server.not_modified == 1
+
+    def test_lru_eviction(self):
+        jira_obj, adapter = self._jira_obj_get()
+        size = len(jira_obj._session.get(
+            self.server.url + '/rest/api/2/issue/TEST-1').content)
+        # room for two issues
+        jira_obj, adapter = self._jira_obj_get(max_size=size * 2 + 10)
+        for key in ('TEST-1', 'TEST-2', 'TEST-1', 'TEST-3'):
+            jira_obj.issue(key)
+        self.server.stats_reset()
+        jira_obj.issue('TEST-1')
+        jira_obj.issue('TEST-2')
+        # TEST-2 was the least recently used entry
+        assert self.server.not_modified == 1
+        assert len([f for f in os.listdir(self.path)
+                    if len(f) == 40]) == 2
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import unittest
+from ddt import ddt, data, unpack
+import os
+import shutil
+import tempfile
+
+import jiracli
+from jiracli.mirror import mirror_issues_get, mirror_open, mirror_query, \
+    mirror_search, mirror_sprint, mirror_store, mirror_sync
+from jiracli.tests.fakejira import FakeJira, issue_raw
+
+
+@ddt
+class MirrorTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp(prefix='jiracli-tmp_')
+        self.conn = mirror_open(os.path.join(self.tmpdir, 'sub',
+                                             'mirror.sqlite'))
+
+    def tearDown(self):
+        self.conn.close()
+        shutil.rmtree(self.tmpdir)
+
+    def _store(self, key, **fields):
+        project, number = key.split('-')
+        raw = issue_raw(project, number)
+        for name, value in fields.items():
+            raw['fields'][name] = {'name': value} if value else None
+        mirror_store(self.conn, raw)
+
+    @data(
+        ('', "SELECT raw FROM issues ORDER BY project, number", []),
+        ('project = TEST',
+         "SELECT raw FROM issues WHERE project = ? ORDER BY project, number",
+         ['TEST']),
+        ('assignee = currentUser() AND status not in (Closed, "Resolved")',
+         "SELECT raw FROM issues WHERE assignee = ? AND status NOT IN "
+         "(?, ?) ORDER BY project, number", ['joe', 'Closed', 'Resolved']),
+        ('assignee is EMPTY ORDER BY key DESC',
+         "SELECT raw FROM issues WHERE assignee IS NULL "
+         "ORDER BY project DESC, number DESC", []),
+    )
+    @unpack
+    def test_mirror_query(self, jql, sql, params):
+        assert mirror_query(jql, user='joe') == (sql, params)
+
+    @data('summary ~ foo', 'project = A OR project = B',
+          'project = A ORDER BY summary')
+    def test_mirror_query_unsupported(self, jql):
+        with self.assertRaises(ValueError):
+            mirror_query(jql)
+
+    def test_mirror_search(self):
+        self._store('TEST-10', assignee='joe')
+        self._store('TEST-2', assignee=None)
+        self._store('OTHER-1', assignee='joe')
+        keys = [r['key'] for r in mirror_search(self.conn, 'project = test')]
+        assert keys == ['TEST-2', 'TEST-10']
+        keys = [r['key'] for r in mirror_search(
+            self.conn, 'assignee = currentUser()', user='joe', limit=1)]
+        assert keys == ['OTHER-1']
+        assert [r['key'] for r in mirror_search(
+            self.conn, 'assignee is empty')] == ['TEST-2']
+
+    def test_mirror_sync(self):
+        server = FakeJira(issues=30).start()
+        try:
+            for day, raw in enumerate(server.issues.values(), 1):
+                raw['fields']['updated'] = \
+                    '2013-11-%02dT10:00:00.000+0100' % day
+            server.sprint = set(['TEST-1', 'TEST-2'])
+            jira_obj = jiracli.jira_obj_get(server.conf())
+            assert mirror_sync(self.conn, jira_obj, 'TEST',
+                               jiracli.issue_search_iter, page_size=20) == 30
+            assert [r['key'] for r in mirror_sprint(self.conn, 'TEST')] == \
+                ['TEST-1', 'TEST-2']
+            raw = mirror_issues_get(self.conn, ['test-3', 'TEST-99'])
+            assert raw[0]['fields']['summary'] == 'summary of TEST-3'
+            assert raw[1] is None
+
+            # only the issues updated since the last sync are fetched (the
+            # latest one again because of the JQL date resolution)
+            server.issues['TEST-5']['fields']['updated'] = \
+                '2014-01-01T10:00:00.000+0100'
+            server.sprint = set(['TEST-5'])
+            server.stats_reset()
+            assert mirror_sync(self.conn, jira_obj, 'TEST',
+                               jiracli.issue_search_iter) == 2
+            # a single search for the updates and one for the sprint
+            assert server.requests == 2
+            assert [r['key'] for r in mirror_sprint(self.conn, 'TEST')] == \
+                ['TEST-5']
+        finally:
+            server.stop()
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import unittest
+from ddt import ddt, data, unpack
+import mock
+import six
+
+from jiracli.output import RecordWriter
+
+
+@ddt
+class RecordWriterTest(unittest.TestCase):
+    @data(
+        ('jsonl', '{"key": "X-1", "summary": "a, b"}\n'
+         '{"key": "X-2", "extra": "c"}\n'),
+        ('csv', 'key,summary\nX-1,"a, b"\nX-2,\n'),
+        ('tsv', 'key\tsummary\nX-1\ta, b\nX-2\t\n'),
+    )
+    @unpack
+    def test_record_writer(self, fmt, expected):
+        stream = six.StringIO()
+        writer = RecordWriter(fmt, ('key', 'summary'), stream)
+        writer.record({'key': 'X-1', 'summary': 'a, b'})
+        writer.record({'key': 'X-2', 'extra': 'c'})
+        writer.flush()
+        assert stream.getvalue() == expected
+
+    def test_record_writer_buffered(self):
+        stream = mock.Mock(**{'isatty.return_value': False})
+        writer = RecordWriter('jsonl', None, stream, buffer_size=100)
+        for n in range(10):
+            writer.record({'key': 'X-%s' % n})
+        # 10 records with 16 characters each
+        assert stream.write.call_count == 1
+        writer.flush()
+        assert stream.write.call_count == 2
+        assert "".join(c[0][0] for c in stream.write.call_args_list) == \
+            "".join('{"key": "X-%s"}\n' % n for n in range(10))
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import email.utils
+import threading
+import time
+import unittest
+from ddt import ddt, data, unpack
+import mock
+import requests
+
+import jiracli
+from jiracli.ratelimit import AIMDLimiter, RetryAdapter, retry_after_get
+from jiracli.tests.fakejira import FakeJira
+
+
+def _response(status, headers=None):
+    response = requests.models.Response()
+    response.status_code = status
+    response.headers.update(headers or {})
+    response._content = b''
+    return response
+
+
+def _request(method):
+    return requests.Request(method, 'http://jira/rest/api/2/issue/T-1'
+                            ).prepare()
+
+
+@ddt
+class RateLimitTest(unittest.TestCase):
+    @data(
+        (None, None),
+        ('3', 3.0),
+        ('-1', 0.0),
+        ('soon', None),
+    )
+    @unpack
+    def test_retry_after_get(self, value, expected):
+        headers = {'Retry-After': value} if value else {}
+        assert retry_after_get(_response(429, headers)) == expected
+
+    def test_retry_after_get_date(self):
+        value = email.utils.formatdate(time.time() + 30, usegmt=True)
+        delay = retry_after_get(_response(429, {'Retry-After': value}))
+        assert 25 < delay <= 30
+
+    def test_limiter(self):
+        limiter = AIMDLimiter(8)
+        with limiter as window:
+            pass
+        limiter.feedback(True, window)
+        assert int(limiter.limit) == 4
+        # throttled requests sent before the decrease
+        limiter.feedback(True, window)
+        assert int(limiter.limit) == 4
+        for _ in range(3):
+            with limiter as window:
+                pass
+            limiter.feedback(True, window)
+        assert limiter.limit == 1.0
+        # additive increase: about one more per "limit" requests
+        for _ in range(3):
+            limiter.feedback(False, window)
+        assert int(limiter.limit) == 2
+        for _ in range(100):
+            limiter.feedback(False, window)
+        assert limiter.limit == 8
+        assert limiter.throttled == 5
+
+    def test_limiter_max_limit_set(self):
+        limiter = AIMDLimiter(4)
+        limiter.max_limit_set(32)
+        assert limiter.limit == 32
+        limiter.max_limit_set(2)
+        assert limiter.limit == 2
+        # a throttled limit is kept
+        limiter.max_limit_set(32)
+        with limiter as window:
+            pass
+        limiter.feedback(True, window)
+        limiter.max_limit_set(64)
+        assert limiter.limit == 16
+        assert limiter.max_limit == 64
+        limiter.max_limit_set(8)
+        assert limiter.limit == 8
+
+    def test_limiter_blocks(self):
+        limiter = AIMDLimiter(2)
+        entered = []
+
+        def worker():
+            with limiter:
+                entered.append(1)
+
+        with limiter:
+            with limiter:
+                thread = threading.Thread(target=worker)
+                thread.start()
+                thread.join(0.1)
+                # the limit is reached
+                assert not entered
+        thread.join()
+        assert entered
+
+    @data(
+        ('GET', 429, 3),
+        ('POST', 429, 3),
+        ('GET', 503, 3),
+        ('POST', 503, 1),
+        ('PUT', 502, 3),
+        ('POST', 502, 1),
+        ('GET', 404, 1),
+        ('GET', 200, 1),
+    )
+    @unpack
+    def test_retry_adapter(self, method, status, expected):
+        inner = mock.Mock()
+        inner.send.side_effect = lambda *a, **kw: _response(
+            status, {'Retry-After': '0'})
+        adapter = RetryAdapter(inner, AIMDLimiter(4), max_retries=2,
+                               backoff=0)
+        response = adapter.send(_request(method))
+        assert response.status_code == status
+        assert inner.send.call_count == expected
+
+    @data(
+        ('GET', 2),
+        ('POST', 1),
+    )
+    @unpack
+    def test_retry_adapter_connection_error(self, method, expected):
+        inner = mock.Mock()
+        inner.send.side_effect = [requests.exceptions.ConnectionError(),
+                                  _response(200)]
+        adapter = RetryAdapter(inner, AIMDLimiter(4), backoff=0)
+        try:
+            assert adapter.send(_request(method)).status_code == 200
+        except requests.exceptions.ConnectionError:
+            assert method == 'POST'
+        assert inner.send.call_count == expected
+
+    @mock.patch('jiracli.print', create=True)
+    def test_bulk_edit_throttled(self, mock_print):
+        server = FakeJira(issues=16, latency=0.02, max_concurrent=2).start()
+        try:
+            jira_obj = jiracli.jira_obj_get(server.conf(), jobs=8)
+            issues = ['TEST-%s' % i for i in range(1, 17)]
+            # all edits succeed although the server throttles
+            assert jiracli.issues_field_edit(
+                jira_obj, issues, 'labels', 'add', ['a'], jobs=8)
+            assert server.throttled > 0
+            for key in issues:
+                assert server.issues[key]['fields']['labels'] == \
+                    ['label', 'a']
+        finally:
+            server.stop()
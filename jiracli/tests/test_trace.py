@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import unittest
+from ddt import ddt, data, unpack
+import mock
+import six
+
+import jiracli
+from jiracli.trace import HttpTrace, path_pattern, profile_run
+from jiracli.tests.fakejira import FakeJira
+
+
+@ddt
+class TraceTest(unittest.TestCase):
+    @data(
+        ('/rest/api/2/issue/TEST-12', '/rest/api/2/issue/{key}'),
+        ('/rest/api/2/issue/TEST-12/transitions',
+         '/rest/api/2/issue/{key}/transitions'),
+        ('/rest/api/2/filter/123', '/rest/api/2/filter/{id}'),
+        ('/rest/api/2/search', '/rest/api/2/search'),
+    )
+    @unpack
+    def test_path_pattern(self, path, expected):
+        assert path_pattern(path) == expected
+
+    def test_http_trace(self):
+        server = FakeJira(issues=3).start()
+        try:
+            trace = HttpTrace()
+            jira_obj = jiracli.jira_obj_get(server.conf(), trace=trace)
+            for key in ('TEST-1', 'TEST-2', 'TEST-99'):
+                try:
+                    jira_obj.issue(key)
+                except Exception:
+                    pass
+            issues = [r for r in trace.records if '/issue/' in r[1]]
+            # the jira module retries a 404 for a GET some times
+            assert [r[2] for r in issues[:2]] == [200, 200]
+            assert issues[0][0] == 'GET'
+            assert issues[0][3] > 0
+            summary = trace.summary()
+            assert 'GET /rest/api/2/issue/{key}' in summary
+            assert summary.splitlines()[-1].startswith('total')
+        finally:
+            server.stop()
+
+    def test_profile_run(self):
+        with mock.patch('sys.stderr', six.StringIO()) as stderr:
+            assert profile_run(lambda x: x + 1, 1) == 2
+        assert 'function calls' in stderr.getvalue()
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""instrumentation to find out why a command is slow (see --trace-http
+and --profile)"""
+
+from collections import OrderedDict
+import logging
+import re
+import sys
+import threading
+
+
+LOG = logging.getLogger('jiracli.http')
+
+
+def path_pattern(path):
+    """get the path with issue keys and ids replaced so the requests for
+    different issues are grouped together"""
+    path = re.sub(r'/[A-Za-z][A-Za-z0-9_]*-\d+(?=/|$)', '/{key}', path)
+    # but not the api version (ie. /rest/api/2/)
+    return re.sub(r'(?<!/api)/\d+(?=/|$)', '/{id}', path)
+
+
+class HttpTrace(object):
+    """log the method, path, status, size and latency of every response
+    of a requests session and summarize them"""
+
+    def __init__(self):
+        self.records = []
+        self._lock = threading.Lock()
+
+    def install(self, session):
+        session.hooks['response'].append(self._hook)
+
+    def _hook(self, response, *args, **kwargs):
+        from six.moves.urllib.parse import urlparse
+
+        path = urlparse(response.request.url).path
+        status = response.status_code
+        if getattr(response, 'from_cache', False):
+            # answered with "304 Not Modified" (see httpcache)
+            status, size = 304, 0
+        elif kwargs.get('stream'):
+            # do not consume streamed responses
+            size = int(response.headers.get('Content-Length') or 0)
+        else:
+            size = len(response.content)
+        latency = response.elapsed.total_seconds() * 1000
+        with self._lock:
+            self.records.append((response.request.method, path, status,
+                                 size, latency))
+        LOG.info("%s %s %s %d bytes %.1f ms", response.request.method,
+                 path, status, size, latency)
+
+    def summary(self):
+        """get a table with the number of requests, bytes and the latency
+        per method and path (see path_pattern())"""
+        groups = OrderedDict()
+        with self._lock:
+            records = list(self.records)
+        for method, path, status, size, latency in records:
+            group = groups.setdefault(
+                "%s %s" % (method, path_pattern(path)), [0, 0, 0.0])
+            group[0] += 1
+            group[1] += size
+            group[2] += latency
+        lines = ["%s%s%s%s%s" % ("request".ljust(50), "count".rjust(7),
+                                 "bytes".rjust(12), "ms".rjust(10),
+                                 "avg ms".rjust(9))]
+        rows = sorted(groups.items(), key=lambda g: g[1][2], reverse=True)
+        rows.append(('total', [len(records), sum(r[3] for r in records),
+                               sum(r[4] for r in records)]))
+        for name, (count, size, latency) in rows:
+            lines.append("%s%7d%12d%10.1f%9.1f" % (
+                name.ljust(50), count, size, latency, latency / count
+                if count else 0.0))
+        return "\n".join(lines) + "\n"
+
+
+def profile_run(func, *args, **kwargs):
+    """call func with a profiler and write the top hot spots (by
+    cumulative time) to stderr, also if func raises (ie. SystemExit)"""
+    import cProfile
+    import pstats
+
+    profile = cProfile.Profile()
+    try:
+        return profile.runcall(func, *args, **kwargs)
+    finally:
+        stats = pstats.Stats(profile, stream=sys.stderr)
+        stats.sort_stats('cumulative').print_stats(30)